@@ -1,10 +1,9 @@
 import enum
 
-import jinja2
-
 from pydantic import BaseModel, validator
 
-from altcosa.config.common import ConfigExecutionError
+from altcosa.config.common import ConfigExecutionError, ConfigValidationError
+from altcosa.config.template import TemplateEngine
 from altcosa.config.utils import CmdBuilder, Storage
 
 
@@ -26,7 +25,7 @@ class DefineItem(BaseModel):
     value: str
     mode: DefineValueMode = DefineValueMode.JINJA
 
-    def process(self) -> None:
+    def process(self, pool: dict[str, str] | None = None) -> None:
         """
         execute define item at config file by mode of interpretation
 
@@ -34,13 +33,15 @@ class DefineItem(BaseModel):
             - JINJA: resolve like jinja variable
             - SHELL: resolve like shell command result
             - MANUAL: resolve like value that pass the user
+
+        :param pool: variables to render the value with and to store it to (default: global storage pool)
+        :type pool: dict[str, str] | None
         """
-        storage = Storage()
+        pool = Storage().pool if pool is None else pool
 
         match self.mode:
             case DefineValueMode.JINJA:
-                tmpl = jinja2.Environment(loader=jinja2.BaseLoader()).from_string(self.value)
-                storage.pool[self.name] = tmpl.render(**storage.pool)
+                pool[self.name] = TemplateEngine().render(self.value, pool)
             case DefineValueMode.SHELL:
                 proc = CmdBuilder(self.value).build()
                 if proc.wait() != 0:
@@ -51,9 +52,9 @@ class DefineItem(BaseModel):
                 if not proc.stdout:
                     raise ValueError("process has not stdout pipe")
 
-                storage.pool[self.name] = proc.stdout.read().decode()
+                pool[self.name] = proc.stdout.read().decode()
             case DefineValueMode.MANUAL:
-                storage.pool[self.name] = self.value
+                pool[self.name] = self.value
 
 
 class PipeItem(BaseModel):
@@ -69,6 +70,11 @@ class PipeItem(BaseModel):
     skip - script will be skipped if True
     log - script will be logged if True
     store_result_at - store script result at defined variable
+    id - item identifier that other items refer to at `needs`
+    needs - identifiers of items that must be finished before this one
+        if not set, item depends on the previous item of the pipe
+    cache - reuse the stored result if the script, arguments and inputs are not changed
+    inputs - fingerprinted item inputs for the cache key (see `altcosa.config.cache.InputKind`)
     """
     name: str
     args: dict[str, str]
@@ -77,6 +83,10 @@ class PipeItem(BaseModel):
     skip: bool = False
     log: bool = True
     store_result_at: str | None = None
+    id: str | None = None  # noqa: VNE003
+    needs: list[str] | None = None
+    cache: bool = False
+    inputs: list[str] = []
 
     @validator("name")
     @classmethod
@@ -95,3 +105,34 @@ class Config(BaseModel):
     version: int
     define: list[DefineItem]
     pipe: list[PipeItem]
+
+    def dependencies(self) -> dict[int, set[int]]:
+        """
+        Build the pipe dependency graph
+
+        :raises ConfigValidationError: if item needs an unknown or duplicated id
+        :return: pipe item index mapped to indexes of the items it depends on
+        :rtype: dict[int, set[int]]
+        """
+        ids: dict[str, int] = {}
+
+        for index, item in enumerate(self.pipe):
+            if item.id is None:
+                continue
+            if item.id in ids:
+                raise ConfigValidationError(f"duplicated pipe item id: \"{item.id}\"")
+            ids[item.id] = index
+
+        graph: dict[int, set[int]] = {}
+
+        for index, item in enumerate(self.pipe):
+            if item.needs is None:
+                graph[index] = {index - 1} if index else set()
+                continue
+
+            if unknown := set(item.needs).difference(ids):
+                raise ConfigValidationError(f"\"{item.name}\" needs unknown items: {sorted(unknown)}")
+
+            graph[index] = {ids[need] for need in item.needs}
+
+        return graph
@@ -0,0 +1,121 @@
+import enum
+import hashlib
+import json
+import os
+import pathlib
+
+from altcosa.config.base import PipeItem
+from altcosa.config.common import CACHE_DIR, ConfigExecutionError
+from altcosa.core.cache import DiskCache
+
+
+class InputKind(enum.StrEnum):
+    """
+    Kinds of the pipe item inputs fingerprints
+
+    input format: <kind>:<value>
+        file:/path/to/file - file mtime and size
+        tree:/path/to/dir - mtime and size of every file at the directory tree
+        ostree:/path/to/repo:<ref> - commit checksum the ref points to
+        value:<anything> - value itself (e.g. commit checksum got by another item)
+    """
+    FILE = "file"
+    TREE = "tree"
+    OSTREE = "ostree"
+    VALUE = "value"
+
+
+def _stat_fingerprint(path: str) -> str:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return "missing"
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _tree_fingerprint(path: str) -> str:
+    digest = hashlib.sha256()
+
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            digest.update(f"{os.path.relpath(file_path, path)}:{_stat_fingerprint(file_path)}\n".encode())
+
+    return digest.hexdigest()
+
+
+def _ostree_fingerprint(value: str) -> str:
+    repo, _, ref = value.rpartition(":")
+
+    try:
+        return pathlib.Path(repo, "refs", "heads", ref).read_text().strip()
+    except FileNotFoundError:
+        return "missing"
+
+
+class StepCache:
+    """
+    Outputs of the succeeded pipe items
+
+    Output is stored by the key made from the script content hash,
+    rendered arguments and fingerprints of the declared inputs.
+    """
+    __slots__ = ("storage",)
+
+    def __init__(self, storage: DiskCache | None = None) -> None:
+        self.storage = storage or DiskCache(CACHE_DIR.joinpath("steps"))
+
+    @staticmethod
+    def fingerprint(spec: str) -> str:
+        """
+        Get the fingerprint of the item input
+
+        :param spec: input in <kind>:<value> format
+        :type spec: str
+        :raises ConfigExecutionError: if input kind is unknown
+        :return: input fingerprint
+        :rtype: str
+        """
+        kind, _, value = spec.partition(":")
+
+        match kind:
+            case InputKind.FILE:
+                return _stat_fingerprint(value)
+            case InputKind.TREE:
+                return _tree_fingerprint(value)
+            case InputKind.OSTREE:
+                return _ostree_fingerprint(value)
+            case InputKind.VALUE:
+                return value
+
+        raise ConfigExecutionError(f"unknown input kind: \"{spec}\"")
+
+    def key(self, item: PipeItem, script: str) -> str:
+        """
+        Make the cache key of the rendered pipe item
+
+        :param item: pipe item with rendered arguments and inputs
+        :type item: PipeItem
+        :param script: script path
+        :type script: str
+        :return: hex digest
+        :rtype: str
+        """
+        digest = hashlib.sha256()
+
+        with open(script, "rb") as file:
+            digest.update(hashlib.file_digest(file, "sha256").digest())
+
+        inputs = [(spec, self.fingerprint(spec)) for spec in item.inputs]
+        digest.update(json.dumps([item.as_root, sorted(item.args.items()), inputs]).encode())
+
+        return digest.hexdigest()
+
+    def get(self, key: str) -> str | None:
+        if (data := self.storage.get(key)) is None:
+            return None
+        return data.decode()
+
+    def put(self, key: str, output: str) -> None:
+        self.storage.put(key, output.encode())
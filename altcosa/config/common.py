@@ -1,19 +1,168 @@
+import json
+import os
 import pathlib
+import threading
+import typing
+
+from altcosa.core.cache import CACHE_DIR
 
 
 PROJECT_DIR = pathlib.Path(__file__).parent.parent.parent
 SCRIPTS_DIR = pathlib.Path(f"{PROJECT_DIR}/scripts")
 
-SCRIPTS_REGISTRY: dict[str, str] = {}
+# python scripts that may be called in-process declare their entrypoint
+# at the header comment, e.g. `# altcosa: entrypoint=main`
+ENTRYPOINT_MARKER = "# altcosa: entrypoint="
+
+Manifest: typing.TypeAlias = dict[str, dict[str, typing.Any]]
+
+
+def read_entrypoint(script: pathlib.Path) -> str | None:
+    """
+    Get the entrypoint function name declared at the script header
+
+    :param script: script path
+    :type script: pathlib.Path
+    :return: function name if declared
+    :rtype: str | None
+    """
+    if script.suffix != ".py":
+        return None
+
+    with open(script) as file:
+        for _, line in zip(range(5), file):
+            if line.startswith(ENTRYPOINT_MARKER):
+                return line.removeprefix(ENTRYPOINT_MARKER).strip()
+
+    return None
+
+
+class ScriptsManifest:
+    """
+    Scripts found at `SCRIPTS_DIR`, discovered on the first use
+
+    Discovery result is cached at the manifest file, it is valid while mtimes
+    of the scripts directories and python scripts (their headers declare
+    the entrypoints) are not changed.
+    """
+    __slots__ = ("path", "_content", "_lock")
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+        self._content: Manifest | None = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _mtime(path: str) -> int | None:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    @classmethod
+    def discover(cls) -> Manifest:
+        """
+        Walk `SCRIPTS_DIR` and collect the scripts
+
+        :return: scripts paths, entrypoints and mtimes of the walked paths
+        :rtype: Manifest
+        """
+        content: Manifest = {
+            "scripts": {},
+            "entrypoints": {},
+            "mtimes": {str(SCRIPTS_DIR): cls._mtime(str(SCRIPTS_DIR))},
+        }
+
+        for version in SCRIPTS_DIR.glob("v*"):
+            content["mtimes"][str(version)] = cls._mtime(str(version))
+
+            for script in version.glob("cmd-*"):
+                script_name = script.name
+                script_label = script_name.removeprefix("cmd-")
+                script_version = version.name.removeprefix("v")
+
+                content["scripts"][f"{script_label}@{script_version}"] = str(script)
+
+                if script.suffix == ".py":
+                    content["mtimes"][str(script)] = cls._mtime(str(script))
+
+                if entrypoint := read_entrypoint(script):
+                    content["entrypoints"][f"{script_label}@{script_version}"] = entrypoint
+
+        return content
+
+    def _read(self) -> Manifest | None:
+        try:
+            with open(self.path) as file:
+                content: Manifest = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if content.get("mtimes", {}).get(str(SCRIPTS_DIR)) is None:
+            return None
+
+        if any(self._mtime(path) != mtime for path, mtime in content["mtimes"].items()):
+            return None
+
+        return content
+
+    def _write(self, content: Manifest) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(content))
+            tmp_path.replace(self.path)
+        except OSError:
+            pass
+
+    def get(self, field: str) -> dict[str, typing.Any]:
+        """
+        Get the manifest field (scripts or entrypoints)
+
+        :param field: field name
+        :type field: str
+        :return: field content
+        :rtype: dict[str, typing.Any]
+        """
+        with self._lock:
+            if self._content is None:
+                if (content := self._read()) is None:
+                    content = self.discover()
+                    self._write(content)
+                self._content = content
+
+        return self._content[field]
+
+
+class ScriptsRegistry(typing.MutableMapping[str, str]):
+    """
+    Lazy view of the scripts manifest field, scripts may be registered at runtime
+    """
+    __slots__ = ("_manifest", "_field")
+
+    def __init__(self, manifest: ScriptsManifest, field: str) -> None:
+        self._manifest = manifest
+        self._field = field
+
+    def __getitem__(self, key: str) -> str:
+        return typing.cast(str, self._manifest.get(self._field)[key])
+
+    def __setitem__(self, key: str, value: str) -> None:
+        self._manifest.get(self._field)[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self._manifest.get(self._field)[key]
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self._manifest.get(self._field))
+
+    def __len__(self) -> int:
+        return len(self._manifest.get(self._field))
 
-if not SCRIPTS_REGISTRY:
-    for version in SCRIPTS_DIR.glob("v*"):
-        for script in version.glob("cmd-*"):
-            script_name = script.name
-            script_label = script_name.removeprefix("cmd-")
-            script_version = version.name.removeprefix("v")
 
-            SCRIPTS_REGISTRY[f"{script_label}@{script_version}"] = str(script)
+SCRIPTS_MANIFEST = ScriptsManifest(CACHE_DIR.joinpath("scripts-manifest.json"))
+SCRIPTS_REGISTRY = ScriptsRegistry(SCRIPTS_MANIFEST, "scripts")
+SCRIPTS_ENTRYPOINTS = ScriptsRegistry(SCRIPTS_MANIFEST, "entrypoints")
 
 
 class ConfigError(Exception):
@@ -0,0 +1,259 @@
+import importlib.util
+import os
+import pickle
+import resource
+import shlex
+import signal
+import socket
+import sys
+import threading
+import traceback
+import types
+import typing
+
+from altcosa.config.common import SCRIPTS_ENTRYPOINTS, SCRIPTS_REGISTRY
+
+
+Entrypoint: typing.TypeAlias = typing.Callable[[list[str]], object]
+
+REQUEST_SIZE = 1024 ** 2
+
+_modules: dict[str, types.ModuleType] = {}
+_modules_lock = threading.Lock()
+
+
+def load_entrypoint(name: str) -> Entrypoint | None:
+    """
+    Get the in-process entrypoint of the script
+
+    Script module is loaded once per process, so the children forked by the zygote
+    share its already imported dependencies (gi, OSTree, rpm, ...)
+
+    :param name: script name (e.g. ver.py@1)
+    :type name: str
+    :return: entrypoint function if the script declares it
+    :rtype: Entrypoint | None
+    """
+    if (entrypoint := SCRIPTS_ENTRYPOINTS.get(name)) is None:
+        return None
+
+    with _modules_lock:
+        if (module := _modules.get(name)) is None:
+            path = SCRIPTS_REGISTRY[name]
+            module_name = f"altcosa_script_{name.replace('.', '_').replace('@', '_v').replace('-', '_')}"
+            spec = importlib.util.spec_from_file_location(module_name, path)
+
+            if spec is None or spec.loader is None:
+                raise ImportError(f"failed to load script \"{path}\"")
+
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            _modules[name] = module
+
+    return typing.cast(Entrypoint, getattr(module, entrypoint))
+
+
+def make_argv(**opts: str) -> list[str]:
+    """
+    Make the argument vector like the shell does for `CmdBuilder.opts`
+
+    :return: argument vector
+    :rtype: list[str]
+    """
+    return shlex.split(" ".join(f"--{k} {v}" for k, v in opts.items()))
+
+
+class ForkedScript:
+    """
+    Script entrypoint running at the child forked by the zygote
+
+    Child stdout and stderr are redirected to the `stdout` pipe,
+    exit code is taken from `SystemExit` (0 if the entrypoint returns).
+    Exit status and resource usage of the child are sent by its waiter.
+    """
+    __slots__ = ("pid", "stdout", "returncode", "_result")
+
+    def __init__(self, pid: int, stdout: typing.BinaryIO, result: typing.BinaryIO) -> None:
+        self.pid = pid
+        self.stdout = stdout
+        self.returncode: int | None = None
+        self._result = result
+
+    @staticmethod
+    def run_child(entrypoint: Entrypoint | None, argv: list[str], fd: int, error: str | None = None) -> typing.NoReturn:
+        code = 1
+
+        try:
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            os.dup2(fd, sys.stdout.fileno())
+            os.dup2(fd, sys.stderr.fileno())
+            os.close(fd)
+
+            if entrypoint is None:
+                print(error, file=sys.stderr)
+            else:
+                sys.argv = [sys.argv[0], *argv]
+                entrypoint(argv)
+                code = 0
+        except SystemExit as e:
+            if isinstance(e.code, int) or e.code is None:
+                code = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def wait_with_usage(self) -> tuple[int, resource.struct_rusage]:
+        """
+        Wait for the child and get the resource usage of it and its waited-for descendants
+
+        :return: exit code and resource usage
+        :rtype: tuple[int, resource.struct_rusage]
+        """
+        try:
+            status, usage = pickle.load(self._result)
+        except EOFError:
+            # the waiter is killed
+            status, usage = 1 << 8, (0,) * 16
+        finally:
+            self._result.close()
+
+        self.returncode = os.waitstatus_to_exitcode(status)
+
+        return self.returncode, resource.struct_rusage(usage)
+
+    def wait(self) -> int:
+        if self.returncode is None:
+            self.wait_with_usage()
+        return typing.cast(int, self.returncode)
+
+
+class Zygote:
+    """
+    Single-threaded process the in-process scripts are forked from
+
+    Executor threads (pipe workers, log writers) may hold locks at the fork time,
+    so the scripts aren't forked from the executor process itself. Zygote is forked
+    before any thread is started, loads every script module once and forks a waiter
+    per script run. Waiter forks the script child, waits for it and sends
+    its exit status and resource usage back.
+    """
+    __slots__ = ("pid", "_socket", "_lock")
+
+    def __init__(self) -> None:
+        parent, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        if (pid := os.fork()) == 0:
+            parent.close()
+            self._serve(child)
+
+        child.close()
+
+        self.pid = pid
+        self._socket = parent
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _serve(cls, connection: socket.socket) -> typing.NoReturn:
+        code = 0
+
+        try:
+            # waiters are reaped by the kernel, the executor handles the interruption
+            signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+            while True:
+                request, fds, _, _ = socket.recv_fds(connection, REQUEST_SIZE, 2)
+
+                if not request:
+                    break
+
+                name, argv = pickle.loads(request)
+                cls._spawn(connection, name, argv, fds[0], fds[1])
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+
+    @staticmethod
+    def _spawn(connection: socket.socket, name: str, argv: list[str], output_fd: int, result_fd: int) -> None:
+        """
+        Fork the waiter of the script run
+        """
+        entrypoint, error = None, None
+
+        try:
+            entrypoint = load_entrypoint(name)
+        except Exception:
+            error = traceback.format_exc()
+
+        if os.fork() != 0:
+            os.close(output_fd)
+            os.close(result_fd)
+            return
+
+        connection.close()
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+
+        if (pid := os.fork()) == 0:
+            os.close(result_fd)
+            ForkedScript.run_child(entrypoint, argv, output_fd, error)
+
+        os.close(output_fd)
+
+        with os.fdopen(result_fd, "wb") as result:
+            pickle.dump(pid, result)
+            result.flush()
+            _, status, usage = os.wait4(pid, 0)
+            pickle.dump((status, tuple(usage)), result)
+
+        os._exit(0)
+
+    def start(self, name: str, argv: list[str]) -> ForkedScript:
+        """
+        Run the script entrypoint at the new child
+
+        :param name: script name (e.g. ver.py@1)
+        :type name: str
+        :param argv: script arguments
+        :type argv: list[str]
+        :return: started script
+        :rtype: ForkedScript
+        """
+        output_read, output_write = os.pipe()
+        result_read, result_write = os.pipe()
+
+        try:
+            with self._lock:
+                socket.send_fds(self._socket, [pickle.dumps((name, argv))], [output_write, result_write])
+        finally:
+            os.close(output_write)
+            os.close(result_write)
+
+        result = os.fdopen(result_read, "rb")
+
+        try:
+            pid = pickle.load(result)
+        except EOFError:
+            result.close()
+            os.close(output_read)
+            raise ChildProcessError(f"failed to start \"{name}\" at the zygote") from None
+
+        return ForkedScript(pid, os.fdopen(output_read, "rb"), result)
+
+    def close(self) -> None:
+        """
+        Stop the zygote, already started scripts aren't waited for
+        """
+        with self._lock:
+            self._socket.close()
+
+        os.waitpid(self.pid, 0)
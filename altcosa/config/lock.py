@@ -0,0 +1,109 @@
+import fcntl
+import hashlib
+import pathlib
+import shlex
+import types
+import typing
+
+from loguru import logger
+
+from altcosa.config.common import CACHE_DIR
+from altcosa.core.alt import Stream
+
+
+LOCKS_DIR = CACHE_DIR.joinpath("locks")
+
+# pipe item arguments that name the stream the item works with
+STREAM_ARGS = ("stream", "src", "dest")
+
+
+def _unquote(value: str) -> str:
+    try:
+        return " ".join(shlex.split(value))
+    except ValueError:
+        return value
+
+
+def locked_paths(args: dict[str, str]) -> list[pathlib.Path]:
+    """
+    Get the OSTree repositories and work directories of the streams
+    the rendered pipe item arguments refer to
+
+    :param args: rendered pipe item arguments
+    :type args: dict[str, str]
+    :return: sorted paths to lock
+    :rtype: list[pathlib.Path]
+    """
+    if not (repodir := _unquote(args.get("repodir", ""))):
+        return []
+
+    paths: set[pathlib.Path] = set()
+
+    for arg in STREAM_ARGS:
+        if not (value := args.get(arg)):
+            continue
+
+        try:
+            stream = Stream.from_str(repodir, _unquote(value))
+        except ValueError:
+            continue
+
+        paths.update((stream.ostree_dir, stream.work_dir))
+
+    return sorted(paths)
+
+
+class PathLock:
+    """
+    Advisory exclusive locks of the paths shared by the executors (`fcntl.flock`)
+
+    Lock files are kept at `directory`, not at the locked paths,
+    so they may be taken before the paths exist.
+    Paths are locked in the sorted order to avoid deadlocks.
+    """
+    __slots__ = ("paths", "directory", "_files")
+
+    def __init__(self, paths: typing.Iterable[pathlib.Path], directory: pathlib.Path = LOCKS_DIR) -> None:
+        self.paths = sorted(paths)
+        self.directory = directory
+        self._files: list[typing.IO[bytes]] = []
+
+    def _lock_file(self, path: pathlib.Path) -> pathlib.Path:
+        digest = hashlib.sha256(str(path.absolute()).encode()).hexdigest()[:16]
+        return self.directory.joinpath(f"{path.name}-{digest}.lock")
+
+    def acquire(self) -> None:
+        if self.paths:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+        for path in self.paths:
+            lock_file = open(self._lock_file(path), "ab")
+            self._files.append(lock_file)
+
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logger.info(f"waiting for the lock of \"{path}\"")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+    def release(self) -> None:
+        while self._files:
+            lock_file = self._files.pop()
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def __enter__(self) -> typing.Self:
+        try:
+            self.acquire()
+        except BaseException:
+            self.release()
+            raise
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: types.TracebackType | None,
+    ) -> None:
+        self.release()
@@ -0,0 +1,195 @@
+import codecs
+import collections
+import datetime
+import gzip
+import os
+import pathlib
+import queue
+import re
+import threading
+import typing
+
+from altcosa.config.common import CACHE_DIR
+
+
+LOGS_DIR = CACHE_DIR.joinpath("logs")
+CHUNK_SIZE = 1024 ** 2
+# `\r` ends the echoed line too (progress bars)
+LINE_END = re.compile(r"\r\n|\r|\n")
+
+
+class LogStore:
+    """
+    Compressed per-step log files
+
+    Only `keep` most recent logs of each step are stored.
+    """
+    __slots__ = ("directory", "keep")
+
+    def __init__(self, directory: pathlib.Path = LOGS_DIR, keep: int = 10) -> None:
+        self.directory = directory
+        self.keep = keep
+
+    def create(self, name: str) -> pathlib.Path:
+        """
+        Make the new log file path for the step and remove the old logs of it
+
+        :param name: step name
+        :type name: str
+        :return: log file path
+        :rtype: pathlib.Path
+        """
+        name = name.replace("/", "_")
+        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S%f")
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        logs = sorted(self.directory.glob(f"{name}.*.log.gz"))
+
+        for path in logs[:max(len(logs) - self.keep + 1, 0)]:
+            path.unlink(missing_ok=True)
+
+        return self.directory.joinpath(f"{name}.{timestamp}.log.gz")
+
+
+class StepOutput:
+    """
+    Step output capture
+
+    Raw output chunks are written to the compressed log by the writer thread.
+    Memory keeps the whole output if `keep_all` is True, otherwise only the last `tail_size` bytes.
+    Complete decoded lines are passed to `echo` if it is set, the unfinished line
+    is passed as soon as it gets longer than `tail_size`.
+
+    If the log can't be written (e.g. the disk is full) the writer keeps draining
+    the queue, the rest of the log is dropped and the error is kept in `error`.
+    """
+    def __init__(
+        self,
+        log_path: pathlib.Path | None = None,
+        keep_all: bool = False,
+        tail_size: int = CHUNK_SIZE,
+        echo: typing.Callable[[str], None] | None = None,
+    ) -> None:
+        self.log_path = log_path
+        self.keep_all = keep_all
+        self.tail_size = tail_size
+        self.echo = echo
+        self.size = 0
+        self.error: OSError | None = None
+
+        self._chunks: collections.deque[bytes] = collections.deque()
+        self._chunks_size = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._line: list[str] = []
+        self._line_size = 0
+        # the last echoed chunk is ended by `\r`, so the leading `\n` of the next one is skipped
+        self._carriage = False
+        self._queue: queue.Queue[bytes | None] = queue.Queue(maxsize=64)
+        self._writer: threading.Thread | None = None
+
+        if self.log_path is not None:
+            self._writer = threading.Thread(target=self._write, args=(self.log_path,), daemon=True)
+            self._writer.start()
+
+    def _write(self, path: pathlib.Path) -> None:
+        chunk: bytes | None = b""
+
+        try:
+            with gzip.open(path, "wb", compresslevel=1) as file:
+                while (chunk := self._queue.get()) is not None:
+                    file.write(chunk)
+        except OSError as e:
+            self.error = e
+
+        # feed() must not block on the full queue after the writer failure
+        while chunk is not None:
+            chunk = self._queue.get()
+
+    def _echo(self, text: str) -> None:
+        if self.echo is None or not text:
+            return
+
+        start = 1 if self._carriage and text.startswith("\n") else 0
+        self._carriage = text.endswith("\r")
+
+        for match in LINE_END.finditer(text, start):
+            self._line.append(text[start:match.start()])
+            self._flush_line("\n")
+            start = match.end()
+
+        if start < len(text):
+            self._line.append(text[start:])
+            self._line_size += len(text) - start
+
+            if self._line_size > self.tail_size:
+                self._flush_line("\n")
+
+    def _flush_line(self, end: str = "") -> None:
+        if self.echo is not None and self._line:
+            self.echo("".join(self._line) + end)
+
+        self._line.clear()
+        self._line_size = 0
+
+    def _trim(self) -> None:
+        while len(self._chunks) > 1 and self._chunks_size - len(self._chunks[0]) >= self.tail_size:
+            self._chunks_size -= len(self._chunks.popleft())
+
+    def feed(self, chunk: bytes) -> None:
+        """
+        Capture the output chunk
+
+        :param chunk: raw output
+        :type chunk: bytes
+        """
+        self.size += len(chunk)
+
+        if self._writer is not None and self.error is None:
+            self._queue.put(chunk)
+
+        self._chunks.append(chunk)
+        self._chunks_size += len(chunk)
+
+        if not self.keep_all:
+            self._trim()
+
+        if self.echo is not None:
+            self._echo(self._decoder.decode(chunk))
+
+    def read_from(self, fd: int) -> None:
+        """
+        Capture all the output from the file descriptor until EOF
+
+        :param fd: file descriptor to read from
+        :type fd: int
+        """
+        while chunk := os.read(fd, CHUNK_SIZE):
+            self.feed(chunk)
+
+    def close(self) -> None:
+        """
+        Flush the echo and wait for the log writer (`error` is set if the log is incomplete)
+        """
+        self._echo(self._decoder.decode(b"", final=True))
+
+        self._flush_line()
+
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+
+    @property
+    def text(self) -> str:
+        """
+        Captured output (only the tail if `keep_all` is False)
+
+        :return: decoded output
+        :rtype: str
+        """
+        output = b"".join(self._chunks)
+
+        if not self.keep_all:
+            output = output[-self.tail_size:]
+
+        return output.decode(errors="replace")
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import typing
+
+import jinja2
+import jinja2.meta
+
+from altcosa.config.common import ConfigValidationError
+from altcosa.config.utils import SingletonMeta
+
+if typing.TYPE_CHECKING:
+    from altcosa.config.base import Config
+
+
+TEMPLATE_TOKENS = ("{{", "{%", "{#")
+
+
+class TemplateEngine(metaclass=SingletonMeta):
+    """
+    Shared jinja environment with the compiled templates cache
+
+    Templates are cached by their source string,
+    strings without template syntax are not compiled at all.
+    """
+    def __init__(self) -> None:
+        self.env = jinja2.Environment(loader=jinja2.BaseLoader())
+        self._templates: dict[str, jinja2.Template] = {}
+
+    @staticmethod
+    def is_literal(source: str) -> bool:
+        """
+        Check that string has no template syntax
+
+        :param source: template source
+        :type source: str
+        :return: True if string can be used as is
+        :rtype: bool
+        """
+        return not any(token in source for token in TEMPLATE_TOKENS)
+
+    def compile(self, source: str) -> jinja2.Template:
+        """
+        Get the compiled template from the cache or compile it
+
+        :param source: template source
+        :type source: str
+        :return: compiled template
+        :rtype: jinja2.Template
+        """
+        if (tmpl := self._templates.get(source)) is None:
+            tmpl = self._templates.setdefault(source, self.env.from_string(source))
+        return tmpl
+
+    def render(self, source: str, context: typing.Mapping[str, str]) -> str:
+        """
+        Render the template source by the context
+
+        :param source: template source
+        :type source: str
+        :param context: template variables
+        :type context: typing.Mapping[str, str]
+        :return: rendered string
+        :rtype: str
+        """
+        if self.is_literal(source):
+            return source
+        return self.compile(source).render(context)
+
+    def variables(self, source: str) -> set[str]:
+        """
+        Get the variables that template takes from the context
+
+        :param source: template source
+        :type source: str
+        :return: variable names
+        :rtype: set[str]
+        """
+        if self.is_literal(source):
+            return set()
+
+        self.compile(source)
+        names = jinja2.meta.find_undeclared_variables(self.env.parse(source))
+
+        return set(names).difference(self.env.globals)
+
+    def _check(self, label: str, source: str, defined: set[str]) -> list[str]:
+        try:
+            undefined = self.variables(source).difference(defined)
+        except jinja2.TemplateSyntaxError as e:
+            return [f"{label}: {e}"]
+        return [f"{label}: \"{name}\" is undefined" for name in sorted(undefined)]
+
+    def precompile(self, config: Config, defined: typing.Iterable[str] = ()) -> None:
+        """
+        Compile every template of the config and check that all variables they use are defined
+
+        Global defines are checked in their order. Pipe items may use any global define,
+        any pipe item define and any `store_result_at` variable.
+
+        :param config: config to compile
+        :type config: Config
+        :param defined: variables defined before the config execution (e.g. preset)
+        :type defined: typing.Iterable[str]
+        :raises ConfigValidationError: if any template is invalid or uses an undefined variable
+        """
+        from altcosa.config.base import DefineValueMode
+
+        known = set(defined)
+        errors = []
+
+        for item in config.define:
+            if item.mode == DefineValueMode.JINJA:
+                errors.extend(self._check(f"define \"{item.name}\"", item.value, known))
+            known.add(item.name)
+
+        for pipe_item in config.pipe:
+            known.update(define.name for define in pipe_item.define)
+            if pipe_item.store_result_at:
+                known.add(pipe_item.store_result_at)
+
+        for pipe_item in config.pipe:
+            label = pipe_item.id or pipe_item.name
+            sources = [
+                *[(f"{label} define \"{item.name}\"", item.value)
+                  for item in pipe_item.define if item.mode == DefineValueMode.JINJA],
+                *[(f"{label} arg \"{name}\"", value) for name, value in pipe_item.args.items()],
+                *[(f"{label} input", value) for value in pipe_item.inputs],
+            ]
+            for source_label, source in sources:
+                errors.extend(self._check(source_label, source, known))
+
+        if errors:
+            raise ConfigValidationError("invalid templates:\n" + "\n".join(errors))
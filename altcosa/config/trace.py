@@ -0,0 +1,137 @@
+import dataclasses
+import datetime
+import json
+import os
+import pathlib
+import resource
+import threading
+import time
+import typing
+
+from altcosa.config.common import CACHE_DIR
+from altcosa.config.inproc import ForkedScript
+
+
+TRACES_DIR = CACHE_DIR.joinpath("traces")
+
+
+class Waitable(typing.Protocol):
+    pid: int
+    returncode: int | None
+
+
+def wait_with_usage(proc: Waitable | ForkedScript) -> tuple[int, resource.struct_rusage]:
+    """
+    Wait for the process and get the resource usage of it and its waited-for descendants
+
+    :param proc: started process (subprocess.Popen or ForkedScript)
+    :type proc: Waitable
+    :return: exit code and resource usage
+    :rtype: tuple[int, resource.struct_rusage]
+    """
+    if isinstance(proc, ForkedScript):
+        return proc.wait_with_usage()
+
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    return proc.returncode, usage
+
+
+@dataclasses.dataclass
+class StepMetrics:
+    """
+    Resources used by the pipe step
+
+    start - step start time (unix time, s)
+    wall - wall time (s)
+    user - user CPU time of the step process tree (s)
+    system - system CPU time of the step process tree (s)
+    max_rss - peak RSS of the largest process of the step process tree (KiB)
+    output_bytes - size of the step output
+    exit_code - step exit code
+    cached - step result is taken from the step cache
+    """
+    name: str
+    script: str
+    start: float
+    wall: float = 0.0
+    user: float = 0.0
+    system: float = 0.0
+    max_rss: int = 0
+    output_bytes: int = 0
+    exit_code: int | None = None
+    cached: bool = False
+    thread: int = dataclasses.field(default_factory=threading.get_ident)
+
+    def finish(self, exit_code: int, output_bytes: int, usage: resource.struct_rusage | None = None) -> None:
+        self.wall = time.time() - self.start
+        self.exit_code = exit_code
+        self.output_bytes = output_bytes
+
+        if usage is not None:
+            self.user = usage.ru_utime
+            self.system = usage.ru_stime
+            self.max_rss = usage.ru_maxrss
+
+
+class Tracer:
+    """
+    Collects the step metrics and writes them as the JSON summary
+    and Chrome trace-event file (chrome://tracing, ui.perfetto.dev)
+    """
+    def __init__(self, directory: pathlib.Path | None = TRACES_DIR) -> None:
+        self.directory = directory
+        self.steps: list[StepMetrics] = []
+        self.start = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, metrics: StepMetrics) -> None:
+        with self._lock:
+            self.steps.append(metrics)
+
+    def summary(self) -> dict[str, typing.Any]:
+        return {
+            "start": self.start,
+            "wall": time.time() - self.start,
+            "steps": [dataclasses.asdict(step) for step in sorted(self.steps, key=lambda step: step.start)],
+        }
+
+    def trace_events(self) -> dict[str, typing.Any]:
+        threads = {ident: n for n, ident in enumerate(dict.fromkeys(step.thread for step in self.steps))}
+        events = []
+
+        for step in self.steps:
+            args = dataclasses.asdict(step)
+            del args["thread"]
+            events.append({
+                "name": step.name,
+                "cat": "cached" if step.cached else "step",
+                "ph": "X",
+                "ts": int((step.start - self.start) * 1e6),
+                "dur": int(step.wall * 1e6),
+                "pid": os.getpid(),
+                "tid": threads[step.thread],
+                "args": args,
+            })
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self) -> pathlib.Path | None:
+        """
+        Write `run-<time>-<pid>.summary.json` and `run-<time>-<pid>.trace.json` files
+
+        :return: summary file path if the directory is set
+        :rtype: pathlib.Path | None
+        """
+        if self.directory is None:
+            return None
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        prefix = datetime.datetime.fromtimestamp(self.start).strftime(f"run-%Y%m%d%H%M%S-{os.getpid()}")
+
+        summary_path = self.directory.joinpath(f"{prefix}.summary.json")
+        summary_path.write_text(json.dumps(self.summary(), indent=2))
+        self.directory.joinpath(f"{prefix}.trace.json").write_text(json.dumps(self.trace_events()))
+
+        return summary_path
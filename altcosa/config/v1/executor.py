@@ -1,68 +1,276 @@
+import functools
 import subprocess
 import sys
-
-import jinja2
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 
 from loguru import logger
 
-from altcosa.config.common import SCRIPTS_REGISTRY
+from altcosa.config.base import PipeItem
+from altcosa.config.cache import StepCache
+from altcosa.config.common import SCRIPTS_ENTRYPOINTS, SCRIPTS_REGISTRY
+from altcosa.config.inproc import ForkedScript, Zygote, make_argv
+from altcosa.config.lock import PathLock, locked_paths
+from altcosa.config.output import CHUNK_SIZE, LogStore, StepOutput
+from altcosa.config.template import TemplateEngine
+from altcosa.config.trace import StepMetrics, Tracer, wait_with_usage
 from altcosa.config.utils import CmdBuilder, Storage
 from altcosa.config.v1.schema import Config
 from altcosa.config.v1.validator import Validator
 
 
 class Executor:
-    def __init__(self, config: Config) -> None:
+    def __init__(
+        self,
+        config: Config,
+        workers: int = 1,
+        step_cache: StepCache | None = None,
+        log_store: LogStore | None = None,
+        output_tail: int = CHUNK_SIZE,
+        in_process: bool = True,
+        tracer: Tracer | None = None,
+        label: str | None = None,
+    ) -> None:
         self.config = Validator(config).validate()
+        self.workers = workers
+        self.step_cache = step_cache or StepCache()
+        self.log_store = log_store or LogStore()
+        self.output_tail = output_tail
+        self.in_process = in_process
+        self.tracer = tracer or Tracer()
+        self.label = label
+        self._print_lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self._zygote: Zygote | None = None
 
     def _execute_global_define(self) -> None:
         for item in self.config.define:
             item.process()
 
-    def _execute_pipe(self) -> None:  # noqa: C901
-        storage = Storage()
+    def _print(self, item: PipeItem, output: str) -> None:
+        """
+        Print the item output, lines are prefixed by the executor label
+        and by the item label if several items may run at once
+
+        :param item: pipe item that produced the output
+        :type item: PipeItem
+        :param output: output line
+        :type output: str
+        """
+        prefix = [self.label] if self.label else []
+
+        if self.workers > 1:
+            prefix.append(item.id or item.name)
+
+        if prefix:
+            output = f"[{' '.join(prefix)}] {output}"
+
+        with self._print_lock:
+            print(output, end="")
+
+    def _render_item(self, item: PipeItem) -> None:
+        """
+        Process the item defines and render its arguments and inputs
+
+        Items may be rendered at once, so the item defines are processed at the copy
+        of the storage pool and aren't visible to other items.
+        """
+        with self._pool_lock:
+            context = dict(Storage().pool)
+
+        for define_item in item.define:
+            define_item.process(context)
+
+        engine = TemplateEngine()
+
+        for arg_name, arg_value in item.args.items():
+            item.args[arg_name] = engine.render(arg_value, context)
+
+        item.inputs = [engine.render(value, context) for value in item.inputs]
+
+    def _start_script(self, item: PipeItem, script: str) -> subprocess.Popen | ForkedScript:
+        """
+        Start the item script
+
+        Non-root python scripts that declare the entrypoint are run at the child forked
+        by the zygote, so they don't pay for the interpreter start and imports.
+        Other scripts are run by the shell.
+
+        :param item: rendered pipe item
+        :type item: PipeItem
+        :param script: script path
+        :type script: str
+        :return: started process
+        :rtype: subprocess.Popen | ForkedScript
+        """
+        if self._zygote is not None and not item.as_root and item.name in SCRIPTS_ENTRYPOINTS:
+            return self._zygote.start(item.name, make_argv(**item.args))
+
+        return (
+            CmdBuilder(script).
+            opts(**item.args).
+            root(item.as_root).
+            stderr(subprocess.STDOUT).
+            build()
+        )
+
+    def _run_script(self, item: PipeItem, script: str, name: str) -> tuple[str, bool]:
+        """
+        Run the item script
+
+        Whole output is written to the step log, only the output tail
+        is kept in memory unless the item stores or caches its result.
+
+        :param item: rendered pipe item
+        :type item: PipeItem
+        :param script: script path
+        :type script: str
+        :param name: step name for the log file
+        :type name: str
+        :return: script output and True if the script is succeeded
+        :rtype: tuple[str, bool]
+        """
+        metrics = StepMetrics(name, item.name, time.time())
+        proc = self._start_script(item, script)
 
-        for item in self.config.pipe:
-            if item.skip:
-                continue
+        if not proc.stdout:
+            raise ValueError("process has not stdout pipe")
 
-            for define_item in item.define:
-                define_item.process()
+        output = StepOutput(
+            self.log_store.create(name),
+            keep_all=bool(item.store_result_at or item.cache),
+            tail_size=self.output_tail,
+            echo=functools.partial(self._print, item) if item.log else None,
+        )
 
-            for arg_name, arg_value in item.args.items():
-                tmpl = jinja2.Environment(loader=jinja2.BaseLoader()).from_string(arg_value)
-                item.args[arg_name] = tmpl.render(**storage.pool)
+        try:
+            output.read_from(proc.stdout.fileno())
+        finally:
+            output.close()
+            proc.stdout.close()
 
-            script = SCRIPTS_REGISTRY[item.name]
-            proc = (
-                CmdBuilder(script).
-                opts(**item.args).
-                root(item.as_root).
-                stderr(subprocess.STDOUT).
-                build()
-            )
+        if output.error is not None:
+            logger.warning(f"\"{name}\" log is incomplete: {output.error}")
 
-            if not proc.stdout:
-                raise ValueError("process has not stdout pipe")
+        exit_code, usage = wait_with_usage(proc)
+        metrics.finish(exit_code, output.size, usage)
+        self.tracer.record(metrics)
 
-            whole_output = ""
+        if not (succeeded := exit_code == 0):
+            logger.error(f"\"{name}\" is failed, see the log: {output.log_path}")
 
-            for output in proc.stdout:
-                output = output.decode()
+        return output.text, succeeded
 
-                if item.log:
-                    print(output, end="")
+    def _execute_item(self, index: int) -> bool:
+        """
+        Execute single pipe item
 
-                whole_output += output
+        :param index: index of the pipe item to execute
+        :type index: int
+        :return: True if the item is succeeded
+        :rtype: bool
+        """
+        item = self.config.pipe[index]
 
-            if item.store_result_at:
-                storage.pool[item.store_result_at] = whole_output
+        if item.skip:
+            return True
 
-            if proc.wait() != 0:
-                logger.error("process is failed")
+        self._render_item(item)
+
+        name = f"{index:02d}-{item.id or item.name}"
+        script = SCRIPTS_REGISTRY[item.name]
+        cache_key = self.step_cache.key(item, script) if item.cache else None
+
+        if cache_key and (cached_output := self.step_cache.get(cache_key)) is not None:
+            logger.info(f"\"{item.id or item.name}\" result is taken from the cache")
+            metrics = StepMetrics(name, item.name, time.time(), cached=True)
+            metrics.finish(0, len(cached_output.encode()))
+            self.tracer.record(metrics)
+            if item.log:
+                for line in cached_output.splitlines(keepends=True):
+                    self._print(item, line)
+            return self._complete_item(item, cached_output, True)
+
+        with PathLock(locked_paths(item.args)):
+            output, succeeded = self._run_script(item, script, name)
+
+        if cache_key and succeeded:
+            self.step_cache.put(cache_key, output)
+
+        return self._complete_item(item, output, succeeded)
+
+    def _complete_item(self, item: PipeItem, output: str, succeeded: bool) -> bool:
+        if item.store_result_at:
+            with self._pool_lock:
+                Storage().pool[item.store_result_at] = output
+        return succeeded
+
+    def _submit_ready(
+        self,
+        pool: ThreadPoolExecutor,
+        pending: dict[int, set[int]],
+        done: set[int],
+        running: dict[Future[bool], int],
+    ) -> None:
+        """
+        Submit the pending items whose dependencies are all done
+        """
+        for index in [index for index, needs in pending.items() if needs <= done]:
+            del pending[index]
+            running[pool.submit(self._execute_item, index)] = index
+
+    def _execute_pipe(self) -> None:
+        """
+        Execute the pipe items by their dependency graph
+
+        Item starts as soon as all the items it needs are succeeded.
+        After the first failure no more items are started,
+        already running items are waited for.
+        """
+        pending = self.config.dependencies()
+        done: set[int] = set()
+        running: dict[Future[bool], int] = {}
+        failed: list[PipeItem] = []
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while pending or running:
+                if not failed:
+                    self._submit_ready(pool, pending, done, running)
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in finished:
+                    index = running.pop(future)
+
+                    if future.result():
+                        done.add(index)
+                    else:
+                        failed.append(self.config.pipe[index])
+
+        if failed:
+            logger.error("process is failed")
+            for item in failed:
                 logger.error(item.name)
-                sys.exit(1)
+            sys.exit(1)
 
     def execute(self) -> None:
+        TemplateEngine().precompile(self.config, Storage().pool)
         self._execute_global_define()
-        self._execute_pipe()
+
+        # forked before the pipe threads are started
+        if self.in_process:
+            self._zygote = Zygote()
+
+        try:
+            self._execute_pipe()
+        finally:
+            if self._zygote is not None:
+                self._zygote.close()
+                self._zygote = None
+
+            if (summary_path := self.tracer.write()) is not None:
+                logger.info(f"steps summary is written to {summary_path}")
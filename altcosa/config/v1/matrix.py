@@ -0,0 +1,148 @@
+import dataclasses
+import multiprocessing
+import pathlib
+import time
+import typing
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+
+from loguru import logger
+
+from altcosa.config.common import ConfigError
+from altcosa.config.output import LogStore
+from altcosa.config.trace import TRACES_DIR, Tracer
+from altcosa.config.utils import Storage
+from altcosa.config.v1.executor import Config, Executor
+
+
+@dataclasses.dataclass
+class MatrixResult:
+    label: str
+    succeeded: bool
+    wall: float = 0.0
+    steps: int = 0
+    error: str | None = None
+
+
+def preset_label(preset: dict[str, str]) -> str:
+    """
+    Make the preset label from its values that are not paths (e.g. x86_64-p10-base)
+
+    :param preset: preset
+    :type preset: dict[str, str]
+    :return: label
+    :rtype: str
+    """
+    return "-".join(str(value) for value in preset.values() if "/" not in str(value)) or "preset"
+
+
+class Matrix:
+    """
+    One config executed over the list of presets
+
+    Every preset is executed at the separate process (storage and template engine
+    are per process), up to `processes` at once. Steps of the different presets that share
+    an OSTree repository or a stream work directory are serialized by the executor locks.
+    """
+    def __init__(
+        self,
+        content: dict[str, typing.Any],
+        presets: list[dict[str, str]],
+        processes: int = 2,
+        log_store: LogStore | None = None,
+        trace_dir: pathlib.Path | None = TRACES_DIR,
+        **executor_options: typing.Any,
+    ) -> None:
+        self.content = content
+        self.presets = presets
+        self.processes = processes
+        self.log_store = log_store or LogStore()
+        self.trace_dir = trace_dir
+        self.executor_options = executor_options
+
+    def labels(self) -> list[str]:
+        labels: list[str] = []
+
+        for index, preset in enumerate(self.presets):
+            label = preset_label(preset)
+            labels.append(f"{label}-{index}" if label in labels else label)
+
+        return labels
+
+    def _run_preset(self, label: str, preset: dict[str, str]) -> MatrixResult:
+        """
+        Execute the config with the preset (called at the worker process)
+        """
+        start = time.time()
+        tracer = Tracer(self.trace_dir)
+        error = None
+
+        pool = Storage().pool
+        pool.clear()
+        pool.update(preset)
+
+        try:
+            Executor(
+                Config.model_validate(self.content),
+                log_store=LogStore(self.log_store.directory.joinpath(label), self.log_store.keep),
+                tracer=tracer,
+                label=label,
+                **self.executor_options,
+            ).execute()
+        except SystemExit as e:
+            if e.code:
+                error = "pipe is failed"
+        except (ConfigError, ValueError) as e:
+            error = str(e)
+
+        return MatrixResult(label, error is None, time.time() - start, len(tracer.steps), error)
+
+    def run(self) -> list[MatrixResult]:
+        """
+        Execute the config with all the presets
+
+        :return: results in the presets order
+        :rtype: list[MatrixResult]
+        """
+        labels = self.labels()
+        results: dict[str, MatrixResult] = {}
+
+        with ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("fork")) as pool:
+            futures: dict[Future[MatrixResult], str] = {
+                pool.submit(self._run_preset, label, preset): label
+                for label, preset in zip(labels, self.presets)
+            }
+
+            for future in as_completed(futures):
+                label = futures[future]
+
+                try:
+                    results[label] = future.result()
+                except Exception as e:
+                    results[label] = MatrixResult(label, False, error=f"{type(e).__name__}: {e}")
+
+                if not results[label].succeeded:
+                    logger.error(f"\"{label}\" is failed")
+
+        return [results[label] for label in labels]
+
+    @staticmethod
+    def format_summary(results: list[MatrixResult]) -> str:
+        """
+        Make the per-preset results table
+
+        :param results: matrix results
+        :type results: list[MatrixResult]
+        :return: table
+        :rtype: str
+        """
+        width = max([len("PRESET"), *(len(result.label) for result in results)])
+        lines = [f"{'PRESET':{width}}  STATUS  STEPS  {'WALL':>9}  ERROR"]
+
+        for result in results:
+            status = "ok" if result.succeeded else "FAILED"
+            lines.append(
+                f"{result.label:{width}}  {status:6}  {result.steps:5}  {result.wall:8.1f}s  {result.error or ''}"
+                .rstrip()
+            )
+
+        return "\n".join(lines)
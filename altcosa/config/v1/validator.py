@@ -1,41 +1,164 @@
+import hashlib
+import json
+import os
+import pathlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from loguru import logger
 
-from altcosa.config.common import ConfigValidationError, ConfigVersionError, SCRIPTS_REGISTRY, ScriptNotFoundError
+from altcosa.config.base import PipeItem
+from altcosa.config.common import (
+    CACHE_DIR,
+    ConfigValidationError,
+    ConfigVersionError,
+    SCRIPTS_REGISTRY,
+    ScriptNotFoundError,
+)
 from altcosa.config.utils import CmdBuilder
 from altcosa.config.v1.schema import Config
 
 
+class ValidationCache:
+    """
+    Keys of the pipe items that have passed the script arguments check
+
+    Key is made from the script content hash and the item arguments,
+    so the item is checked again as soon as the script or the config is changed.
+    """
+    __slots__ = ("path", "limit", "_entries")
+
+    def __init__(self, path: pathlib.Path | None = None, limit: int = 1024) -> None:
+        self.path = path or CACHE_DIR.joinpath("validation.json")
+        self.limit = limit
+
+        try:
+            with open(self.path) as file:
+                self._entries: dict[str, float] = json.load(file)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    @staticmethod
+    def key(item: PipeItem, script: str) -> str:
+        """
+        Make the cache key of the pipe item
+
+        :param item: pipe item to check
+        :type item: PipeItem
+        :param script: script path
+        :type script: str
+        :return: hex digest
+        :rtype: str
+        """
+        digest = hashlib.sha256()
+
+        with open(script, "rb") as file:
+            digest.update(hashlib.file_digest(file, "sha256").digest())
+
+        digest.update(json.dumps([item.as_root, sorted(item.args.items())]).encode())
+
+        return digest.hexdigest()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def add(self, key: str) -> None:
+        self._entries[key] = time.time()
+
+    def save(self) -> None:
+        """
+        Write the cache keeping only the `limit` most recently checked entries
+        """
+        entries = dict(sorted(self._entries.items(), key=lambda entry: entry[1])[-self.limit:])
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w") as file:
+                json.dump(entries, file)
+            tmp_path.replace(self.path)
+        except OSError as e:
+            logger.warning(f"failed to save validation cache: {e}")
+
+
 class Validator:
-    def __init__(self, config: Config) -> None:
+    def __init__(self, config: Config, workers: int = 8, cache: ValidationCache | None = None) -> None:
         self.config = config
+        self.workers = workers
+        self.cache = cache if cache is not None else ValidationCache()
 
     def _validate_version(self) -> None:
         if self.config.version != 1:
             raise ConfigVersionError(f"invalid version number: \"{self.config.version}\"")
 
+    @staticmethod
+    def _check_item(item: PipeItem, script: str) -> str | None:
+        """
+        Check the script arguments of the pipe item
+
+        :param item: pipe item to check
+        :type item: PipeItem
+        :param script: script path
+        :type script: str
+        :return: script error output if the check is failed
+        :rtype: str | None
+        """
+        proc = CmdBuilder(script).args("-c").opts(**item.args).root(item.as_root).build()
+
+        _, stderr = proc.communicate()
+
+        if proc.returncode == 0:
+            return None
+
+        if stderr is None:
+            raise ValueError("process has no stderr pipe")
+
+        return str(stderr.decode())
+
     def _validate_pipe(self) -> None:
-        validate_failed = False
+        checks: dict[str, tuple[PipeItem, str]] = {}
 
         for item in self.config.pipe:
             if (script := SCRIPTS_REGISTRY.get(item.name)) is None:
-                raise ScriptNotFoundError(f"script \"{script}\" not found")
+                raise ScriptNotFoundError(f"script \"{item.name}\" not found")
+
+            if (key := self.cache.key(item, script)) not in self.cache:
+                checks[key] = (item, script)
 
-            proc = CmdBuilder(script).args("-c").opts(**item.args).root(item.as_root).build()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = dict(zip(checks, pool.map(lambda check: self._check_item(*check), checks.values())))
+
+        validate_failed = False
 
-            if proc.wait() != 0:
-                validate_failed = True
+        for key, output in results.items():
+            if output is None:
+                self.cache.add(key)
+                continue
 
-                if proc.stderr is None:
-                    raise ValueError("process has no stderr pipe")
+            validate_failed = True
+            logger.error(f"failed to check \"{checks[key][0].name}\" script arguments: {output}")
 
-                output = proc.stderr.read().decode()
-                logger.error(f"failed to check \"{item.name}\" script arguments: {output}")
+        self.cache.save()
 
         if validate_failed:
             raise ConfigValidationError("validation is failed see the logs")
 
+    def _validate_graph(self) -> None:
+        graph = self.config.dependencies()
+
+        while ready := [index for index, needs in graph.items() if not needs]:
+            for index in ready:
+                del graph[index]
+            for needs in graph.values():
+                needs.difference_update(ready)
+
+        if graph:
+            names = [self.config.pipe[index].id or self.config.pipe[index].name for index in sorted(graph)]
+            raise ConfigValidationError(f"pipe has dependency cycle between: {names}")
+
     def validate(self) -> Config:
         self._validate_version()
+        self._validate_graph()
         self._validate_pipe()
 
         return self.config
@@ -1,16 +1,54 @@
 from __future__ import annotations
 
+import collections
 import dataclasses
 import datetime
 import enum
+import functools
+import os
 import pathlib
+import threading
+import time
+import types
 import typing
 
-import gi  # type: ignore
+if typing.TYPE_CHECKING:
+    from gi.repository import OSTree  # type: ignore
 
-gi.require_version("OSTree", "1.0")
+    from altcosa.core.history import History
 
-from gi.repository import GLib, Gio, OSTree  # type: ignore # noqa: I202,E402
+
+GI_MODULES = ("GLib", "Gio", "OSTree")
+
+# number of the loaded commits kept by every repository
+COMMITS_CACHE_SIZE = 1024
+
+# refs of the opened repository are checked for the changes made by other processes at most once per period (s)
+REFS_CHECK_PERIOD = 1.0
+
+
+@functools.cache
+def gi_modules() -> types.SimpleNamespace:
+    """
+    Load GLib, Gio and OSTree typelibs on the first use,
+    so the stream-only users (e.g. `Stream.export`) don't pay for them
+
+    :return: namespace with GLib, Gio and OSTree modules
+    :rtype: types.SimpleNamespace
+    """
+    import gi  # type: ignore
+
+    gi.require_version("OSTree", "1.0")
+
+    from gi.repository import GLib, Gio, OSTree  # type: ignore # noqa: I202
+
+    return types.SimpleNamespace(GLib=GLib, Gio=Gio, OSTree=OSTree)
+
+
+def __getattr__(name: str) -> typing.Any:
+    if name in GI_MODULES:
+        return getattr(gi_modules(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class OSName(enum.StrEnum):
@@ -191,20 +229,254 @@ class Stream:
         return ";".join(exports)
 
 
+@dataclasses.dataclass(frozen=True, slots=True)
+class CommitMeta:
+    """
+    Decoded fields of the loaded commit
+
+    variant - commit GVariant (see `OSTree.Repo.load_commit`)
+    version - raw version string from the commit metadata
+    timestamp - commit time (unix time, s)
+    """
+    variant: typing.Any
+    version: str | None
+    description: str
+    parent: str | None
+    timestamp: int
+
+    @classmethod
+    def from_variant(cls, variant: typing.Any) -> typing.Self:
+        OSTree = gi_modules().OSTree
+
+        return cls(
+            variant,
+            variant[0].get("version"),
+            str(variant[4]),
+            OSTree.commit_get_parent(variant) or None,
+            OSTree.commit_get_timestamp(variant),
+        )
+
+
+class CommitsCache:
+    """
+    Loaded commits of the repository, commits are immutable,
+    so `size` most recently used of them are kept
+    """
+    __slots__ = ("size", "_commits", "_lock")
+
+    def __init__(self, size: int = COMMITS_CACHE_SIZE) -> None:
+        self.size = size
+        self._commits: collections.OrderedDict[str, CommitMeta] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, hashsum: str) -> CommitMeta | None:
+        with self._lock:
+            if (meta := self._commits.get(hashsum)) is not None:
+                self._commits.move_to_end(hashsum)
+            return meta
+
+    def put(self, hashsum: str, meta: CommitMeta) -> None:
+        with self._lock:
+            self._commits[hashsum] = meta
+            while len(self._commits) > self.size:
+                self._commits.popitem(last=False)
+
+
+PoolKey: typing.TypeAlias = tuple[str, int]
+
+
+@dataclasses.dataclass(slots=True)
+class PoolHandle:
+    """
+    Opened repository of the thread
+
+    generation - generation of the repository path the handle is opened at
+    signature - refs directories mtimes the handle is opened or last checked at
+    checked - time of the last refs check (monotonic, s)
+    """
+    storage: OSTree.Repo
+    generation: int
+    signature: tuple[int, ...]
+    checked: float
+
+
+class RepositoryPool:
+    """
+    Opened OSTree repositories shared by the `Repository` instances, keyed by (path, mode)
+
+    Every thread gets its own handle, the loaded commits cache is shared.
+    Handle is reopened if the repository is invalidated (refs are changed by this process)
+    or if its refs are changed on disk by other processes (mtimes of the `refs/heads`
+    directories), the refs are checked at most once per `check_period` seconds.
+    """
+    __slots__ = ("check_period", "_local", "_commits", "_generations", "_lock")
+
+    def __init__(self, check_period: float = REFS_CHECK_PERIOD) -> None:
+        self.check_period = check_period
+        self._local = threading.local()
+        self._commits: dict[PoolKey, CommitsCache] = {}
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def signature(path: pathlib.Path) -> tuple[int, ...]:
+        """
+        Get mtimes of the repository refs directories
+
+        :param path: repository path
+        :type path: pathlib.Path
+        :return: refs directories mtimes
+        :rtype: tuple[int, ...]
+        """
+        mtimes = []
+        directories = [str(path.joinpath("refs", "heads"))]
+
+        while directories:
+            try:
+                with os.scandir(directory := directories.pop()) as entries:
+                    mtimes.append(os.stat(directory).st_mtime_ns)
+                    directories.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                mtimes.append(-1)
+
+        return tuple(mtimes)
+
+    def storage(self, path: pathlib.Path, mode: OSTree.RepoMode) -> OSTree.Repo:
+        """
+        Get the opened repository handle of the current thread
+
+        :param path: repository path
+        :type path: pathlib.Path
+        :param mode: repository mode
+        :type mode: OSTree.RepoMode
+        :raises GLib.Error: if the repository can't be opened
+        :return: opened repository
+        :rtype: OSTree.Repo
+        """
+        key = (str(path), int(mode))
+        handles: dict[PoolKey, PoolHandle] = self._local.__dict__.setdefault("handles", {})
+        generation = self._generations.get(key[0], 0)
+        now = time.monotonic()
+
+        if (handle := handles.get(key)) is not None and handle.generation == generation:
+            if now - handle.checked < self.check_period:
+                return handle.storage
+
+            if (signature := self.signature(path)) == handle.signature:
+                handle.checked = now
+                return handle.storage
+        else:
+            signature = self.signature(path)
+
+        gi = gi_modules()
+        storage = gi.OSTree.Repo.new(gi.Gio.file_new_for_path(str(path)))
+        storage.open()
+        handles[key] = PoolHandle(storage, generation, signature, now)
+
+        return storage
+
+    def invalidate(self, path: pathlib.Path) -> None:
+        """
+        Reopen the repository handles of all the threads on the next access (e.g. after the refs are written)
+
+        :param path: repository path
+        :type path: pathlib.Path
+        """
+        with self._lock:
+            self._generations[str(path)] = self._generations.get(str(path), 0) + 1
+
+    def commits(self, path: pathlib.Path, mode: OSTree.RepoMode) -> CommitsCache:
+        """
+        Get the loaded commits cache of the repository
+
+        :param path: repository path
+        :type path: pathlib.Path
+        :param mode: repository mode
+        :type mode: OSTree.RepoMode
+        :return: commits cache
+        :rtype: CommitsCache
+        """
+        with self._lock:
+            return self._commits.setdefault((str(path), int(mode)), CommitsCache())
+
+    def clear(self) -> None:
+        """
+        Drop all the handles of the current thread and the commits caches
+        """
+        self._local.__dict__.pop("handles", None)
+
+        with self._lock:
+            self._commits.clear()
+
+
+REPOSITORY_POOL = RepositoryPool()
+
+
 class Repository:
-    __slots__ = ("stream", "mode", "path", "storage")
+    """
+    Repository of the stream, handles are taken from `REPOSITORY_POOL`,
+    so instances are cheap and may be shared by threads
+    """
+    __slots__ = ("stream", "mode", "path", "_commits")
 
     def __init__(self, stream: Stream, mode: OSTree.RepoMode) -> None:
+        gi = gi_modules()
+
         self.stream = stream
         self.mode = mode
 
-        if self.mode == OSTree.RepoMode.BARE:
+        if self.mode == gi.OSTree.RepoMode.BARE:
             self.path = self.stream.ostree_bare_dir
-        elif self.mode == OSTree.RepoMode.ARCHIVE:
+        elif self.mode == gi.OSTree.RepoMode.ARCHIVE:
             self.path = self.stream.ostree_archive_dir
 
-        self.storage = OSTree.Repo.new(Gio.file_new_for_path(str(self.path)))
-        self.storage.open()
+        # open the handle right away, so the invalid repository fails here
+        REPOSITORY_POOL.storage(self.path, self.mode)
+
+        self._commits = REPOSITORY_POOL.commits(self.path, self.mode)
+
+    @property
+    def storage(self) -> OSTree.Repo:
+        """
+        Get the opened repository handle of the current thread
+
+        :return: opened repository
+        :rtype: OSTree.Repo
+        """
+        return REPOSITORY_POOL.storage(self.path, self.mode)
+
+    def load_commit(self, hashsum: str) -> CommitMeta:
+        """
+        Load the commit and decode its fields (see `CommitsCache`)
+
+        :param hashsum: commit checksum
+        :type hashsum: str
+        :raises GLib.Error: if the commit does not exist
+        :return: decoded commit
+        :rtype: CommitMeta
+        """
+        if (meta := self._commits.get(hashsum)) is None:
+            meta = CommitMeta.from_variant(self.storage.load_commit(hashsum)[1])
+            self._commits.put(hashsum, meta)
+
+        return meta
+
+    def history(self, update: bool = False) -> History:
+        """
+        Get the commits index of the repository OSTree directory
+
+        :param update: append the commits the refs got since the last update
+        :type update: bool
+        :return: instance of History
+        :rtype: History
+        """
+        from altcosa.core.history import History  # history module depends on this one
+
+        history = History.for_stream(self.stream)
+        if update:
+            history.update(self)
+
+        return history
 
     def last_commit(self) -> Commit | None:
         """
@@ -263,8 +535,207 @@ class Version:
     def full(self) -> str:
         return f"{self.branch}_{self.name}.{self}"
 
+    def increment(self, part: str | None) -> typing.Self:
+        """
+        Increment the version part (major, minor or date)
+        the version is reset to <today>.0.0 if its date is not today
 
-@dataclasses.dataclass
+        :param part: version part to increment, nothing is changed if None
+        :type part: str | None
+        :return: incremented version (self)
+        :rtype: typing.Self
+        """
+        if not part:
+            return self
+
+        today = datetime.datetime.now().strftime("%Y%m%d")
+        if self.date != today:
+            self.date = today
+            self.major = self.minor = 0
+            return self
+
+        match part:
+            case "minor":
+                self.minor += 1
+            case "major":
+                self.major += 1
+
+        return self
+
+    def export(self) -> str:
+        """
+        Make bash export-like string with all the version views
+
+        :return: bash export-like string
+        :rtype: str
+        """
+        return ";".join([
+            f"export VERSION_NATIVE={self}",
+            f"export VERSION_PATH={self.like_path()}",
+            f"export VERSION_FULL={self.full()}",
+        ])
+
+
+class DiffKind(enum.StrEnum):
+    ADDED = "added"
+    MODIFIED = "modified"
+    REMOVED = "removed"
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class DiffEntry:
+    """
+    Changed path of the commits tree
+
+    size, checksum - of the new path (of the old one if the path is removed),
+    checksum of the directory is its dirtree checksum
+    old_size, old_checksum - of the old path if the path is modified
+
+    Directory is modified if its dirmeta (owner, mode, xattrs) is changed,
+    the changes of its content are separate entries.
+    """
+    kind: DiffKind
+    path: str
+    is_dir: bool
+    size: int
+    checksum: str
+    old_size: int | None = None
+    old_checksum: str | None = None
+
+
+TREE_ATTRIBUTES = "standard::name,standard::type,standard::size"
+
+
+class TreeDiff:
+    """
+    Streaming diff of the commits trees read from the repository (nothing is checked out)
+
+    Directories with the same dirtree checksums are skipped without reading their content,
+    so the diff cost depends on the size of the change, not on the size of the tree.
+    Dirmeta checksums of the directories are compared separately.
+    """
+    __slots__ = ("base", "target")
+
+    def __init__(self, base: Commit, target: Commit) -> None:
+        self.base = base
+        self.target = target
+
+    @staticmethod
+    def _root(commit: Commit) -> typing.Any:
+        return commit.repository.storage.read_commit(commit.hashsum, None)[1]
+
+    @staticmethod
+    def _children(directory: typing.Any) -> dict[str, tuple[typing.Any, typing.Any]]:
+        gi = gi_modules()
+        children = {}
+
+        enumerator = directory.enumerate_children(
+            TREE_ATTRIBUTES, gi.Gio.FileQueryInfoFlags.NOFOLLOW_SYMLINKS, None,
+        )
+        while (info := enumerator.next_file(None)) is not None:
+            children[info.get_name()] = (directory.get_child(info.get_name()), info)
+        enumerator.close(None)
+
+        return children
+
+    @staticmethod
+    def _checksum(repo_file: typing.Any, is_dir: bool) -> str:
+        if is_dir:
+            repo_file.ensure_resolved()
+            return str(repo_file.tree_get_contents_checksum())
+        return str(repo_file.get_checksum())
+
+    @staticmethod
+    def _metadata_checksum(repo_file: typing.Any) -> str:
+        repo_file.ensure_resolved()
+        return str(repo_file.tree_get_metadata_checksum())
+
+    def _entry(self, kind: DiffKind, path: str, repo_file: typing.Any, info: typing.Any) -> DiffEntry:
+        is_dir = info.get_file_type() == gi_modules().Gio.FileType.DIRECTORY
+        return DiffEntry(kind, path, is_dir, info.get_size(), self._checksum(repo_file, is_dir))
+
+    def _subtree(
+        self,
+        kind: DiffKind,
+        path: str,
+        repo_file: typing.Any,
+        info: typing.Any,
+    ) -> typing.Iterator[DiffEntry]:
+        """
+        Yield the path and all its content as added or removed
+        """
+        entry = self._entry(kind, path, repo_file, info)
+        yield entry
+
+        if entry.is_dir:
+            for name, (child, child_info) in sorted(self._children(repo_file).items()):
+                yield from self._subtree(kind, f"{path.rstrip('/')}/{name}", child, child_info)
+
+    def _compare(self, path: str, old: typing.Any, new: typing.Any) -> typing.Iterator[DiffEntry]:
+        """
+        Yield the changes of the directories content
+        """
+        old_children = self._children(old)
+        new_children = self._children(new)
+
+        for name in sorted(old_children.keys() | new_children.keys()):
+            child_path = f"{path.rstrip('/')}/{name}"
+
+            if name not in new_children:
+                yield from self._subtree(DiffKind.REMOVED, child_path, *old_children[name])
+            elif name not in old_children:
+                yield from self._subtree(DiffKind.ADDED, child_path, *new_children[name])
+            else:
+                yield from self._compare_child(child_path, old_children[name], new_children[name])
+
+    def _compare_child(
+        self,
+        path: str,
+        old: tuple[typing.Any, typing.Any],
+        new: tuple[typing.Any, typing.Any],
+    ) -> typing.Iterator[DiffEntry]:
+        old_entry = self._entry(DiffKind.REMOVED, path, *old)
+        new_entry = self._entry(DiffKind.ADDED, path, *new)
+
+        if old_entry.is_dir != new_entry.is_dir:
+            yield from self._subtree(DiffKind.REMOVED, path, *old)
+            yield from self._subtree(DiffKind.ADDED, path, *new)
+        elif new_entry.is_dir:
+            yield from self._compare_dir(path, old[0], new[0], old_entry, new_entry)
+        elif old_entry.checksum != new_entry.checksum:
+            yield dataclasses.replace(
+                new_entry, kind=DiffKind.MODIFIED, old_size=old_entry.size, old_checksum=old_entry.checksum,
+            )
+
+    def _compare_dir(
+        self,
+        path: str,
+        old: typing.Any,
+        new: typing.Any,
+        old_entry: DiffEntry,
+        new_entry: DiffEntry,
+    ) -> typing.Iterator[DiffEntry]:
+        """
+        Yield the directory if its dirmeta is changed and the changes of its content
+        """
+        if self._metadata_checksum(old) != self._metadata_checksum(new):
+            yield dataclasses.replace(
+                new_entry, kind=DiffKind.MODIFIED, old_size=old_entry.size, old_checksum=old_entry.checksum,
+            )
+
+        if old_entry.checksum != new_entry.checksum:
+            yield from self._compare(path, old, new)
+
+    def __iter__(self) -> typing.Iterator[DiffEntry]:
+        old, new = self._root(self.base), self._root(self.target)
+        old_entry, new_entry = (
+            DiffEntry(DiffKind.MODIFIED, "/", True, 0, self._checksum(root, True)) for root in (old, new)
+        )
+
+        yield from self._compare_dir("/", old, new, old_entry, new_entry)
+
+
+@dataclasses.dataclass(slots=True)
 class Commit:
     repository: Repository
     hashsum: str
@@ -272,10 +743,20 @@ class Commit:
     def __str__(self) -> str:
         return self.hashsum
 
+    @property
+    def meta(self) -> CommitMeta:
+        """
+        Get decoded commit (loaded once per repository)
+
+        :return: instance of CommitMeta
+        :rtype: CommitMeta
+        """
+        return self.repository.load_commit(self.hashsum)
+
     def exists(self) -> bool:
         try:
-            self.repository.storage.load_commit(self.hashsum)
-        except GLib.Error:
+            self.meta
+        except gi_modules().GLib.Error:
             return False
         return True
 
@@ -287,8 +768,9 @@ class Commit:
         :return: instance of Version
         :rtype: Version
         """
-        content = self.repository.storage.load_commit(self.hashsum)
-        return Version.from_str(content[1][0]["version"])
+        if (version := self.meta.version) is None:
+            raise ValueError(f"commit \"{self.hashsum}\" has no version")
+        return Version.from_str(version)
 
     @property
     def description(self) -> str:
@@ -298,7 +780,17 @@ class Commit:
         :return: commit message
         :rtype: str
         """
-        return str(self.repository.storage.load_commit(self.hashsum)[1][4])
+        return self.meta.description
+
+    @property
+    def timestamp(self) -> int:
+        """
+        Get commit time
+
+        :return: unix time (s)
+        :rtype: int
+        """
+        return self.meta.timestamp
 
     @property
     def parent(self) -> typing.Self | None:
@@ -308,7 +800,30 @@ class Commit:
         :return: commit parent if exists
         :rtype: typing.Self | None
         """
-        content = self.repository.storage.load_commit(self.hashsum)
-        parent_hashsum = OSTree.commit_get_parent(content[1])
+        parent_hashsum = self.meta.parent
 
         return type(self)(self.repository, parent_hashsum) if parent_hashsum else None
+
+    def ancestors(self) -> typing.Iterator[typing.Self]:
+        """
+        Walk the commit and its parents while they exist (history may be cut)
+
+        :return: iterator from the commit to the oldest one
+        :rtype: typing.Iterator[typing.Self]
+        """
+        commit: typing.Self | None = self
+
+        while commit is not None and commit.exists():
+            yield commit
+            commit = commit.parent
+
+    def diff(self, base: Commit) -> TreeDiff:
+        """
+        Get the changes of the commit tree made since the base commit
+
+        :param base: commit to compare with (e.g. parent)
+        :type base: Commit
+        :return: iterable of the changed paths
+        :rtype: TreeDiff
+        """
+        return TreeDiff(base, self)
@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import collections
+import dataclasses
+import hashlib
+import json
+import os
+import typing
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from altcosa.core.alt import Commit, Repository, gi_modules
+from altcosa.core.cache import CACHE_DIR, DiskCache
+
+
+ANALYTICS_DIR = CACHE_DIR.joinpath("analytics")
+
+# version of the cached commit stats, the stats of another version aren't used
+FORMAT_VERSION = 2
+# object name record of the stored seen objects: sha256 checksum and object type
+OBJECT_RECORD_SIZE = 33
+
+
+def pack_objects(names: typing.Iterable[str]) -> bytes:
+    """
+    Pack the object names to the compressed binary records
+
+    :param names: object names (<checksum>.<objtype>)
+    :type names: typing.Iterable[str]
+    :return: compressed records
+    :rtype: bytes
+    """
+    records = bytearray()
+
+    for name in names:
+        checksum, objtype = name.split(".")
+        records += bytes.fromhex(checksum)
+        records.append(int(objtype))
+
+    return zlib.compress(records, 1)
+
+
+def unpack_objects(data: bytes) -> set[str]:
+    """
+    Unpack the object names packed by `pack_objects`
+
+    :param data: compressed records
+    :type data: bytes
+    :return: object names (<checksum>.<objtype>)
+    :rtype: set[str]
+    """
+    records = memoryview(zlib.decompress(data))
+
+    return {
+        f"{records[start:start + OBJECT_RECORD_SIZE - 1].hex()}.{records[start + OBJECT_RECORD_SIZE - 1]}"
+        for start in range(0, len(records), OBJECT_RECORD_SIZE)
+    }
+
+
+@dataclasses.dataclass
+class CommitStats:
+    """
+    Storage added by the commit
+
+    new_objects, unique_size - objects no earlier commit of the stream has and their storage size
+    churn - changed files count and their size by the directory (up to the churn depth)
+    """
+    commit: str
+    version: str | None
+    timestamp: int
+    new_objects: int = 0
+    unique_size: int = 0
+    churn: dict[str, list[int]] = dataclasses.field(default_factory=dict)
+
+
+@dataclasses.dataclass
+class StreamStats:
+    """
+    Storage of the stream commits
+
+    objects, size - reachable objects of all the commits and their storage size
+    """
+    stream: str
+    repository: str
+    commits: list[CommitStats] = dataclasses.field(default_factory=list)
+
+    @property
+    def objects(self) -> int:
+        return sum(commit.new_objects for commit in self.commits)
+
+    @property
+    def size(self) -> int:
+        return sum(commit.unique_size for commit in self.commits)
+
+    def churn(self) -> dict[str, list[int]]:
+        """
+        Get the changed files count and size by the directory for all the commits
+
+        :return: directory -> [changes, bytes], from the most changed
+        :rtype: dict[str, list[int]]
+        """
+        total: dict[str, list[int]] = collections.defaultdict(lambda: [0, 0])
+
+        for commit in self.commits:
+            for path, (changes, size) in commit.churn.items():
+                total[path][0] += changes
+                total[path][1] += size
+
+        return dict(sorted(total.items(), key=lambda item: item[1], reverse=True))
+
+    def to_dict(self) -> dict[str, typing.Any]:
+        return {
+            "stream": self.stream,
+            "repository": self.repository,
+            "objects": self.objects,
+            "size": self.size,
+            "commits": [dataclasses.asdict(commit) for commit in self.commits],
+            "churn": self.churn(),
+        }
+
+
+class Analyzer:
+    """
+    Unique bytes and per-directory churn of the stream commits
+
+    Commits are walked from the oldest, object sizes are queried by `workers` threads.
+    Stats of every commit are cached (keyed by the churn depth too) and so are the objects
+    of all the commits up to the analyzed head, so reruns only traverse the new commits.
+    """
+    __slots__ = ("workers", "cache", "churn_depth")
+
+    def __init__(self, workers: int | None = None, cache: DiskCache | None = None, churn_depth: int = 3) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = cache or DiskCache(ANALYTICS_DIR, 256 * 1024 ** 2)
+        self.churn_depth = churn_depth
+
+    def _key(self, repository: Repository, ref: str, commit: Commit) -> str:
+        key = f"{FORMAT_VERSION}:{repository.path}:{ref}:{commit}:{self.churn_depth}"
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    @staticmethod
+    def _seen_key(repository: Repository, ref: str, commit: Commit) -> str:
+        return hashlib.sha256(f"{FORMAT_VERSION}:seen:{repository.path}:{ref}:{commit}".encode()).hexdigest()
+
+    def _load_seen(self, repository: Repository, ref: str, commits: list[Commit]) -> tuple[set[str] | None, int]:
+        """
+        Get the stored objects of the newest commit analyzed before and its index
+        """
+        for index in range(len(commits) - 1, -1, -1):
+            if (data := self.cache.get(self._seen_key(repository, ref, commits[index]))) is not None:
+                return unpack_objects(data), index
+
+        return None, -1
+
+    @staticmethod
+    def objects(repository: Repository, hashsum: str, depth: int = 0) -> set[str]:
+        """
+        Get the objects of the commit
+
+        :param repository: repository
+        :type repository: Repository
+        :param hashsum: commit checksum
+        :type hashsum: str
+        :param depth: number of the parents to include (-1 for all)
+        :type depth: int
+        :return: object names (<checksum>.<objtype>)
+        :rtype: set[str]
+        """
+        OSTree = gi_modules().OSTree
+        reachable = repository.storage.traverse_commit(hashsum, depth, None)[1]
+        names = map(OSTree.object_name_deserialize, reachable)
+        return {f"{checksum}.{int(objtype)}" for checksum, objtype in names}
+
+    def size(self, repository: Repository, names: typing.Iterable[str]) -> int:
+        """
+        Get the storage size of the objects (every thread uses its own repository handle)
+
+        :param repository: repository
+        :type repository: Repository
+        :param names: object names (<checksum>.<objtype>)
+        :type names: typing.Iterable[str]
+        :return: size
+        :rtype: int
+        """
+        OSTree = gi_modules().OSTree
+
+        def object_size(name: str) -> int:
+            checksum, objtype = name.split(".")
+            return int(repository.storage.query_object_storage_size(OSTree.ObjectType(int(objtype)), checksum, None)[1])
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            return sum(pool.map(object_size, names, chunksize=256))
+
+    def churn(self, commit: Commit) -> dict[str, list[int]]:
+        """
+        Get the changed files count and size by the directory since the parent
+
+        :param commit: commit
+        :type commit: Commit
+        :return: directory -> [changes, bytes]
+        :rtype: dict[str, list[int]]
+        """
+        churn: dict[str, list[int]] = collections.defaultdict(lambda: [0, 0])
+
+        if (parent := commit.parent) is None or not parent.exists():
+            return {}
+
+        for entry in commit.diff(parent):
+            if entry.is_dir:
+                continue
+
+            directory = "/" + "/".join(entry.path.strip("/").split("/")[:-1][:self.churn_depth])
+            churn[directory][0] += 1
+            churn[directory][1] += entry.size
+
+        return dict(churn)
+
+    def _commit_stats(self, repository: Repository, commit: Commit, seen: set[str]) -> tuple[CommitStats, list[str]]:
+        added = sorted(self.objects(repository, commit.hashsum) - seen)
+        stats = CommitStats(
+            commit.hashsum,
+            commit.meta.version,
+            commit.timestamp,
+            len(added),
+            self.size(repository, added),
+            self.churn(commit),
+        )
+
+        return stats, added
+
+    def analyze(self, repository: Repository, ref: str | None = None) -> StreamStats:
+        """
+        Analyze the commits of the ref
+
+        :param repository: repository
+        :type repository: Repository
+        :param ref: ref (default: repository stream)
+        :type ref: str | None
+        :return: stream stats
+        :rtype: StreamStats
+        """
+        ref = ref or str(repository.stream)
+        result = StreamStats(ref, str(repository.path))
+
+        if (hashsum := repository.storage.resolve_rev(ref, True)[1]) is None:
+            return result
+
+        commits = list(Commit(repository, hashsum).ancestors())[::-1]
+        # objects of the commits up to `seen_index`
+        seen, seen_index = self._load_seen(repository, ref, commits)
+        loaded_index = seen_index
+
+        for index, commit in enumerate(commits):
+            key = self._key(repository, ref, commit)
+
+            if (data := self.cache.get(key)) is not None:
+                result.commits.append(CommitStats(**json.loads(data)))
+                if seen is not None and index > seen_index:
+                    seen.update(self.objects(repository, commit.hashsum))
+                    seen_index = index
+                continue
+
+            if seen is None or seen_index != index - 1:
+                # the stored objects don't end at the parent, read them all at once
+                seen = self.objects(repository, commits[index - 1].hashsum, -1) if index else set()
+
+            stats, added = self._commit_stats(repository, commit, seen)
+            seen.update(added)
+            seen_index = index
+            self.cache.put(key, json.dumps(dataclasses.asdict(stats)).encode())
+            result.commits.append(stats)
+
+        if seen is not None and seen_index > loaded_index:
+            self.cache.put(self._seen_key(repository, ref, commits[seen_index]), pack_objects(seen))
+            if loaded_index >= 0:
+                self.cache.remove(self._seen_key(repository, ref, commits[loaded_index]))
+
+        return result
+
+
+def format_table(streams: list[StreamStats], top: int = 10) -> str:
+    """
+    Make the human-readable report
+
+    :param streams: streams stats
+    :type streams: list[StreamStats]
+    :param top: number of the most changed directories to show
+    :type top: int
+    :return: report
+    :rtype: str
+    """
+    lines = []
+
+    for stream in streams:
+        lines.append(f"{stream.stream} ({stream.repository}): {stream.objects} objects, {stream.size} bytes")
+        lines.append(f"  {'VERSION':24}  {'NEW OBJECTS':>11}  {'UNIQUE BYTES':>14}")
+
+        for commit in stream.commits:
+            label = commit.version or commit.commit[:12]
+            lines.append(f"  {label:24}  {commit.new_objects:11}  {commit.unique_size:14}")
+
+        lines.append(f"  {'DIRECTORY':40}  {'CHANGES':>8}  {'BYTES':>14}")
+
+        for path, (changes, size) in list(stream.churn().items())[:top]:
+            lines.append(f"  {path:40}  {changes:8}  {size:14}")
+
+    return "\n".join(lines)
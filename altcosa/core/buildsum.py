@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+import tempfile
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+from altcosa.core.alt import Arch, Branch, Version
+from altcosa.core.build import Artifact, Format, Platform
+
+
+FormatMapping: typing.TypeAlias = dict[Format, Artifact]
+PlatformMapping: typing.TypeAlias = dict[Platform, FormatMapping]
+VersionMapping: typing.TypeAlias = dict[str, PlatformMapping]
+StreamMapping: typing.TypeAlias = dict[str, VersionMapping]
+ArchMapping: typing.TypeAlias = dict[str, StreamMapping]
+BranchMapping: typing.TypeAlias = dict[Branch, ArchMapping]
+
+MANIFEST_VERSION = 1
+
+# directory changed this close to the scan start may get new entries with the same mtime
+# (timestamps granularity), so its mtime isn't recorded and it's listed again next time
+RACY_MTIME_NS = 2 * 10 ** 9
+
+
+def scan(path: str) -> list[os.DirEntry[str]]:
+    """
+    List the directory (hidden entries are skipped)
+
+    :param path: directory path
+    :type path: str
+    :return: entries, empty if the path is not a directory
+    :rtype: list[os.DirEntry[str]]
+    """
+    try:
+        with os.scandir(path) as entries:
+            return [entry for entry in entries if not entry.name.startswith(".")]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+def write_json(path: pathlib.Path, data: typing.Any) -> None:
+    """
+    Write the JSON file atomically (readers get the old or the new content)
+
+    :param path: file path
+    :type path: pathlib.Path
+    :param data: JSON serializable data
+    :type data: typing.Any
+    """
+    with tempfile.NamedTemporaryFile("w", dir=path.parent, prefix=f".{path.name}.", delete=False) as tmp_file:
+        json.dump(data, tmp_file)
+        tmp_file.flush()
+        os.fsync(tmp_file.fileno())
+        os.fchmod(tmp_file.fileno(), 0o644)
+
+    os.replace(tmp_file.name, path)
+
+
+class Manifest:
+    """
+    Directories mtimes of the builds storage the summary is collected at
+
+    Summary only depends on the entries names, so the directory is listed again
+    only if its mtime has changed. Artifacts aren't stat'ed.
+    """
+    __slots__ = ("path", "storage", "mtimes")
+
+    def __init__(self, path: pathlib.Path, storage: str, mtimes: dict[str, int] | None = None) -> None:
+        self.path = path
+        self.storage = storage
+        self.mtimes = mtimes or {}
+
+    @classmethod
+    def for_branch(cls, storage: str | os.PathLike[str], branch: Branch) -> typing.Self:
+        """
+        Load the manifest of the branch summary (<storage>/.<branch>.manifest.json)
+
+        :param storage: builds storage directory
+        :type storage: str | os.PathLike[str]
+        :param branch: branch
+        :type branch: Branch
+        :return: instance of Manifest, empty if missing or made for another storage path
+        :rtype: typing.Self
+        """
+        manifest = cls(pathlib.Path(storage, f".{branch}.manifest.json"), str(storage))
+
+        try:
+            data = json.loads(manifest.path.read_text())
+        except (FileNotFoundError, ValueError):
+            return manifest
+
+        if data.get("version") == MANIFEST_VERSION and data.get("storage") == manifest.storage:
+            manifest.mtimes = data["mtimes"]
+
+        return manifest
+
+    def write(self) -> None:
+        write_json(self.path, {"version": MANIFEST_VERSION, "storage": self.storage, "mtimes": self.mtimes})
+
+
+class Collector:
+    """
+    Builds of the branch storage (<storage>/<branch>/<arch>/<stream>/<version>/<platform>/<format>/<artifact>)
+
+    Every directory is listed once with os.scandir, stream subtrees
+    are scanned by `workers` threads.
+
+    With the previous summary and its manifest only the directories changed since
+    are listed again, the rest is taken from the previous summary.
+    """
+    __slots__ = ("branch", "storage", "root", "workers", "previous", "mtimes", "manifest", "started")
+
+    def __init__(
+        self,
+        branch: Branch,
+        storage: str | os.PathLike[str],
+        workers: int | None = None,
+        previous: dict[str, typing.Any] | None = None,
+        mtimes: dict[str, int] | None = None,
+    ) -> None:
+        """
+        :param previous: previous summary of the branch (arch mapping as written to <branch>.json)
+        :type previous: dict[str, typing.Any] | None
+        :param mtimes: manifest of the previous summary, directories mtimes are collected if set
+        :type mtimes: dict[str, int] | None
+        """
+        self.branch = branch
+        self.storage = storage
+        self.root = pathlib.Path(self.storage, self.branch)
+        self.workers = workers or min(32, (os.cpu_count() or 1) * 4)
+        self.previous = previous if mtimes is not None else None
+        self.mtimes = mtimes
+        self.manifest: dict[str, int] = {}
+        self.started = 0
+
+    def _changed(self, path: str) -> bool:
+        """
+        Check the directory entries may have changed since the previous summary
+        """
+        if self.mtimes is None:
+            return True
+
+        # paths are joined from the root
+        key = path[len(str(self.root)) + 1:]
+
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return True
+
+        if mtime < self.started - RACY_MTIME_NS:
+            self.manifest[key] = mtime
+
+        return self.mtimes.get(key) != mtime
+
+    def _listing(self, path: str, previous: dict[str, typing.Any] | None) -> list[tuple[str, str]]:
+        """
+        Get the (name, path) of the directory entries, the unchanged directory isn't listed
+        """
+        if self._changed(path) or previous is None:
+            return [(entry.name, entry.path) for entry in scan(path)]
+
+        return [(name, os.path.join(path, name)) for name in previous]
+
+    def collect_artifact(self, path: str, previous: dict[str, str | None] | None = None) -> Artifact:
+        if not self._changed(path) and previous is not None:
+            return Artifact(**previous)
+
+        artifact = Artifact()
+
+        for entry in scan(path):
+            if entry.name.endswith(".xz.sig"):
+                artifact.signature = entry.path
+            elif entry.name.endswith(".xz"):
+                artifact.location = entry.path
+            elif entry.name.endswith(".sig"):
+                artifact.uncompressed_signature = entry.path
+            else:
+                artifact.uncompressed = entry.path
+
+        return artifact
+
+    def collect_platform(self, path: str, previous: dict[str, typing.Any] | None = None) -> PlatformMapping:
+        previous = previous or {}
+
+        return {
+            Platform(platform): {
+                Format(fmt): self.collect_artifact(fmt_path, previous.get(platform, {}).get(fmt))
+                for fmt, fmt_path in self._listing(platform_path, previous.get(platform))
+            }
+            for platform, platform_path in self._listing(path, previous or None)
+        }
+
+    def collect_version(
+        self,
+        path: str,
+        stream: str,
+        version: str,
+        previous: dict[str, typing.Any] | None = None,
+    ) -> PlatformMapping:
+        """
+        Collect the builds of the version
+
+        :param path: version directory
+        :type path: str
+        :param stream: stream name (e.g. base)
+        :type stream: str
+        :param version: native version (e.g. 20230201.4.1)
+        :type version: str
+        :param previous: builds of the version at the previous summary
+        :type previous: dict[str, typing.Any] | None
+        :raises ValueError: invalid version
+        :return: builds by platform and format
+        :rtype: PlatformMapping
+        """
+        Version.from_str(f"{self.branch}_{stream}.{version}")
+        return self.collect_platform(path, previous)
+
+    def collect_stream(self, path: str, stream: str, previous: dict[str, typing.Any] | None = None) -> VersionMapping:
+        previous = previous or {}
+
+        return {
+            version: self.collect_version(version_path, stream, version, previous.get(version))
+            for version, version_path in self._listing(path, previous or None)
+        }
+
+    def collect(self) -> BranchMapping:
+        """
+        Collect the builds of the branch
+
+        :return: builds by arch, stream, version, platform and format
+        :rtype: BranchMapping
+        """
+        previous = self.previous or {}
+        architectures: ArchMapping = {}
+        tasks: list[tuple[str, str, str]] = []
+        self.started = time.time_ns()
+
+        for arch, arch_path in self._listing(str(self.root), self.previous):
+            architectures[Arch(arch).value] = {}
+            tasks.extend(
+                (arch, stream, stream_path)
+                for stream, stream_path in self._listing(arch_path, previous.get(arch))
+            )
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            streams = pool.map(
+                lambda task: self.collect_stream(task[2], task[1], previous.get(task[0], {}).get(task[1])),
+                tasks,
+            )
+
+            for (arch, stream, _), versions in zip(tasks, streams):
+                architectures[arch][stream] = versions
+
+        return {self.branch: architectures}
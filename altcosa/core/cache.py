@@ -0,0 +1,123 @@
+import dataclasses
+import os
+import pathlib
+import tempfile
+
+
+CACHE_DIR = pathlib.Path(os.getenv("XDG_CACHE_HOME", pathlib.Path.home().joinpath(".cache")), "altcosa")
+
+
+@dataclasses.dataclass
+class CacheEntry:
+    key: str
+    size: int
+    used_at: float
+
+
+class DiskCache:
+    """
+    Size bounded key-value storage on the disk
+
+    Every value is stored at the separate file named by the key.
+    File mtime is updated on every hit, the least recently used entries
+    are evicted as soon as the cache size exceeds `max_size`.
+    """
+    __slots__ = ("directory", "max_size")
+
+    def __init__(self, directory: pathlib.Path, max_size: int = 512 * 1024 ** 2) -> None:
+        self.directory = directory
+        self.max_size = max_size
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.directory.joinpath(key[:2], key[2:])
+
+    def get(self, key: str) -> bytes | None:
+        """
+        Get the value by the key
+
+        :param key: entry key (hex digest)
+        :type key: str
+        :return: stored value if exists
+        :rtype: bytes | None
+        """
+        path = self._path(key)
+
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            return None
+
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """
+        Store the value by the key and evict the old entries if needed
+
+        :param key: entry key (hex digest)
+        :type key: str
+        :param data: value to store
+        :type data: bytes
+        """
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=".", delete=False) as file:
+            file.write(data)
+
+        os.replace(file.name, path)
+
+        self.evict()
+
+    def entries(self) -> list[CacheEntry]:
+        """
+        Get all the cache entries from the least to the most recently used
+
+        :return: cache entries
+        :rtype: list[CacheEntry]
+        """
+        entries = []
+
+        for path in self.directory.glob("??/[!.]*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append(CacheEntry(f"{path.parent.name}{path.name}", stat.st_size, stat.st_mtime))
+
+        return sorted(entries, key=lambda entry: entry.used_at)
+
+    def evict(self, max_size: int | None = None) -> list[CacheEntry]:
+        """
+        Remove the least recently used entries until the cache fits the size
+
+        :param max_size: size limit in bytes (default: self.max_size)
+        :type max_size: int | None
+        :return: removed entries
+        :rtype: list[CacheEntry]
+        """
+        max_size = self.max_size if max_size is None else max_size
+        entries = self.entries()
+        size = sum(entry.size for entry in entries)
+        removed = []
+
+        for entry in entries:
+            if size <= max_size:
+                break
+            self.remove(entry.key)
+            size -= entry.size
+            removed.append(entry)
+
+        return removed
+
+    def remove(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def purge(self) -> list[CacheEntry]:
+        """
+        Remove all the cache entries
+
+        :return: removed entries
+        :rtype: list[CacheEntry]
+        """
+        return self.evict(0)
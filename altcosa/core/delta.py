@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import dataclasses
+import os
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+
+from altcosa.core.alt import Repository, Stream, gi_modules
+
+
+@dataclasses.dataclass
+class DeltaReport:
+    """
+    Static delta between the commit and its parent
+
+    generated - delta is generated by this run (False if it has already existed)
+    size - delta size on the disk
+    full_size - size of all the objects of the `to` commit
+    objects_size - size of the `to` commit objects the `from` commit doesn't have
+    (what the client pulls object by object without the delta)
+
+    Objects sizes are computed only for the generated deltas (zero for the existing ones).
+    """
+    stream: str
+    from_commit: str
+    to_commit: str
+    generated: bool = False
+    size: int = 0
+    full_size: int = 0
+    objects_size: int = 0
+
+
+def _b64(checksum: str) -> str:
+    OSTree = gi_modules().OSTree
+    return str(OSTree.checksum_b64_from_bytes(OSTree.checksum_to_bytes(checksum)))
+
+
+def delta_dir(repository: Repository, from_commit: str, to_commit: str) -> pathlib.Path:
+    """
+    Get the static delta directory (see `_ostree_get_relative_static_delta_path`)
+
+    :param repository: repository
+    :type repository: Repository
+    :param from_commit: delta source commit
+    :type from_commit: str
+    :param to_commit: delta target commit
+    :type to_commit: str
+    :return: delta directory path
+    :rtype: pathlib.Path
+    """
+    from_b64 = _b64(from_commit)
+    return repository.path.joinpath("deltas", from_b64[:2], f"{from_b64[2:]}-{_b64(to_commit)}")
+
+
+def _dir_size(path: pathlib.Path) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file()) if path.exists() else 0
+
+
+class DeltaGenerator:
+    """
+    Static deltas between the last commits of the streams and their parents
+
+    Existing deltas are skipped, deltas are generated by `workers` threads
+    (every thread uses its own repository handle), summary is regenerated once.
+    """
+    __slots__ = ("workers",)
+
+    def __init__(self, workers: int | None = None) -> None:
+        self.workers = workers or os.cpu_count() or 1
+
+    @staticmethod
+    def pairs(repository: Repository, depth: int) -> list[tuple[str, str]]:
+        """
+        Get (parent, commit) pairs of the last `depth` commits of the repository stream
+
+        :param repository: repository
+        :type repository: Repository
+        :param depth: number of the last commits
+        :type depth: int
+        :return: pairs from the newest
+        :rtype: list[tuple[str, str]]
+        """
+        pairs: list[tuple[str, str]] = []
+        commit = repository.last_commit()
+
+        while commit is not None and len(pairs) < depth:
+            if (parent := commit.parent) is None or not parent.exists():
+                break
+            pairs.append((parent.hashsum, commit.hashsum))
+            commit = parent
+
+        return pairs
+
+    @staticmethod
+    def objects_sizes(repository: Repository, from_commit: str, to_commit: str) -> tuple[int, int]:
+        """
+        Get sizes of all the `to` commit objects and of its objects the `from` commit doesn't have
+
+        :return: full size and new objects size
+        :rtype: tuple[int, int]
+        """
+        storage = repository.storage
+        deserialize = gi_modules().OSTree.object_name_deserialize
+
+        from_objects = {deserialize(name) for name in storage.traverse_commit(from_commit, 0, None)[1]}
+        full_size = objects_size = 0
+
+        for checksum, objtype in map(deserialize, storage.traverse_commit(to_commit, 0, None)[1]):
+            size = storage.query_object_storage_size(objtype, checksum, None)[1]
+            full_size += size
+            if (checksum, objtype) not in from_objects:
+                objects_size += size
+
+        return full_size, objects_size
+
+    def _generate(self, repository: Repository, report: DeltaReport, exists: bool) -> DeltaReport:
+        if not exists:
+            repository.storage.static_delta_generate(
+                gi_modules().OSTree.StaticDeltaGenerateOpt.MAJOR,
+                report.from_commit,
+                report.to_commit,
+                None,
+                None,
+                None,
+            )
+            report.generated = True
+            report.full_size, report.objects_size = self.objects_sizes(
+                repository, report.from_commit, report.to_commit,
+            )
+
+        report.size = _dir_size(delta_dir(repository, report.from_commit, report.to_commit))
+
+        return report
+
+    def generate(self, streams: list[Stream], depth: int = 5) -> list[DeltaReport]:
+        """
+        Generate the missing static deltas of the archive repositories of the streams
+
+        :param streams: streams
+        :type streams: list[Stream]
+        :param depth: number of the last commits of every stream to make the deltas for
+        :type depth: int
+        :return: all the deltas of the last commits, generated ones are marked
+        :rtype: list[DeltaReport]
+        """
+        OSTree = gi_modules().OSTree
+        tasks: list[tuple[Repository, DeltaReport, bool]] = []
+
+        for stream in streams:
+            repository = Repository(stream, OSTree.RepoMode.ARCHIVE)
+            existing = set(repository.storage.list_static_delta_names(None)[1])
+
+            for from_commit, to_commit in self.pairs(repository, depth):
+                exists = f"{from_commit}-{to_commit}" in existing
+                tasks.append((repository, DeltaReport(str(stream), from_commit, to_commit), exists))
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            reports = list(pool.map(lambda task: self._generate(*task), tasks))
+
+        updated = {repository.path: repository for repository, report, _ in tasks if report.generated}
+
+        for repository in updated.values():
+            repository.storage.regenerate_summary(None, None)
+
+        return reports
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import pathlib
+import sqlite3
+import typing
+
+from altcosa.core.alt import Commit, Repository, Stream, Version, gi_modules
+
+if typing.TYPE_CHECKING:
+    from gi.repository import OSTree  # type: ignore
+
+
+HISTORY_FILE = "history.sqlite"
+
+# index of the older schema is rebuilt
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commits (
+    hashsum TEXT NOT NULL,
+    ref TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    version TEXT,
+    full_version TEXT,
+    date TEXT NOT NULL,
+    parent TEXT,
+    timestamp INTEGER NOT NULL,
+    PRIMARY KEY (mode, ref, hashsum)
+);
+CREATE INDEX IF NOT EXISTS commits_hashsum ON commits (hashsum);
+CREATE INDEX IF NOT EXISTS commits_version ON commits (version);
+CREATE INDEX IF NOT EXISTS commits_ref_timestamp ON commits (ref, timestamp);
+"""
+
+COLUMNS = "hashsum, ref, mode, version, full_version, date, parent, timestamp"
+
+
+def mode_name(mode: OSTree.RepoMode) -> str:
+    """
+    Get the name of the repository mode the commits are indexed at
+
+    :param mode: repository mode
+    :type mode: OSTree.RepoMode
+    :return: bare or archive
+    :rtype: str
+    """
+    return "bare" if mode == gi_modules().OSTree.RepoMode.BARE else "archive"
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class HistoryEntry:
+    """
+    Indexed commit of the ref
+
+    mode - repository mode (bare or archive), bare and archive repositories are indexed separately
+    version - native version (e.g. 20230201.4.1), None if the commit has no valid one
+    full_version - full version (e.g. sisyphus_base.20230201.4.1)
+    date - version date (commit date if the commit has no version), e.g. 20230201
+    timestamp - commit time (unix time, s)
+    """
+    hashsum: str
+    ref: str
+    mode: str
+    version: str | None
+    full_version: str | None
+    date: str
+    parent: str | None
+    timestamp: int
+
+    @classmethod
+    def from_commit(cls, ref: str, commit: Commit) -> typing.Self:
+        meta = commit.meta
+        date = datetime.datetime.fromtimestamp(meta.timestamp).strftime("%Y%m%d")
+        mode = mode_name(commit.repository.mode)
+
+        try:
+            version: Version | None = commit.version
+        except ValueError:
+            version = None
+
+        if version is None:
+            return cls(commit.hashsum, ref, mode, None, None, date, meta.parent, meta.timestamp)
+
+        return cls(
+            commit.hashsum, ref, mode, str(version), version.full(), str(version.date), meta.parent, meta.timestamp,
+        )
+
+
+class History:
+    """
+    Commits index of all the refs of the OSTree directory (SQLite database)
+
+    Bare and archive repositories share the index, their rows are keyed by the mode.
+
+    Index is updated by appending the commits the refs got since the last update,
+    so the lookups don't walk the commits parents.
+    """
+    __slots__ = ("path",)
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+
+    @classmethod
+    def for_stream(cls, stream: Stream) -> typing.Self:
+        """
+        Get the index of the stream OSTree directory
+
+        :param stream: stream
+        :type stream: Stream
+        :return: instance of History
+        :rtype: typing.Self
+        """
+        return cls(stream.ostree_dir.joinpath(HISTORY_FILE))
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+
+        if connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            with connection:
+                connection.execute("DROP TABLE IF EXISTS commits")
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _select(
+        self,
+        where: str,
+        params: tuple[typing.Any, ...],
+        mode: str | None = None,
+        limit: int | None = None,
+    ) -> list[HistoryEntry]:
+        if not self.path.exists():
+            return []
+
+        if mode is not None:
+            where, params = f"({where}) AND mode = ?", (*params, mode)
+
+        query = f"SELECT {COLUMNS} FROM commits WHERE {where} ORDER BY timestamp DESC"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+
+        connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=30)
+        try:
+            return [HistoryEntry(*row) for row in connection.execute(query, params)]
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _new_entries(connection: sqlite3.Connection, ref: str, mode: str, commit: Commit | None) -> list[HistoryEntry]:
+        """
+        Walk the ref commits from the head up to the first indexed one
+        """
+        GLib = gi_modules().GLib
+        entries = []
+
+        while commit is not None:
+            if connection.execute(
+                "SELECT 1 FROM commits WHERE mode = ? AND ref = ? AND hashsum = ?", (mode, ref, commit.hashsum),
+            ).fetchone():
+                break
+
+            try:
+                entries.append(HistoryEntry.from_commit(ref, commit))
+                commit = commit.parent
+            except GLib.Error:
+                # history is cut (e.g. pulled with limited depth)
+                break
+
+        return entries
+
+    def update(self, repository: Repository) -> int:
+        """
+        Append the commits the repository refs got since the last update
+
+        :param repository: repository to index
+        :type repository: Repository
+        :return: number of the appended commits
+        :rtype: int
+        """
+        _, refs = repository.storage.list_refs(None, None)
+        mode = mode_name(repository.mode)
+
+        connection = self._connect()
+        try:
+            with connection:
+                count = 0
+                for ref, hashsum in sorted(refs.items()):
+                    entries = self._new_entries(connection, ref, mode, Commit(repository, hashsum))
+                    connection.executemany(
+                        f"INSERT INTO commits ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        [dataclasses.astuple(entry) for entry in entries],
+                    )
+                    count += len(entries)
+        finally:
+            connection.close()
+
+        return count
+
+    def remove(self, hashsums: list[str], mode: str) -> None:
+        """
+        Remove the pruned commits of the repository from the index
+
+        :param hashsums: commits checksums
+        :type hashsums: list[str]
+        :param mode: mode of the pruned repository (bare or archive)
+        :type mode: str
+        """
+        if not self.path.exists():
+            return
+
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany(
+                    "DELETE FROM commits WHERE mode = ? AND hashsum = ?", [(mode, hashsum) for hashsum in hashsums],
+                )
+        finally:
+            connection.close()
+
+    def get(self, hashsum: str, ref: str | None = None, mode: str | None = None) -> HistoryEntry | None:
+        """
+        Get the indexed commit
+
+        :param hashsum: commit checksum
+        :type hashsum: str
+        :param ref: commit ref (any if not set)
+        :type ref: str | None
+        :param mode: repository mode (any if not set)
+        :type mode: str | None
+        :return: indexed commit if exists
+        :rtype: HistoryEntry | None
+        """
+        if ref is None:
+            entries = self._select("hashsum = ?", (hashsum,), mode, 1)
+        else:
+            entries = self._select("hashsum = ? AND ref = ?", (hashsum, ref), mode, 1)
+
+        return entries[0] if entries else None
+
+    def find(self, version: str, mode: str | None = None) -> list[HistoryEntry]:
+        """
+        Find the commits by version
+
+        :param version: native (e.g. 20230201.4.1) or full (e.g. sisyphus_base.20230201.4.1) version
+        :type version: str
+        :param mode: repository mode (any if not set)
+        :type mode: str | None
+        :return: commits from the newest
+        :rtype: list[HistoryEntry]
+        """
+        return self._select("version = ? OR full_version = ?", (version, version), mode)
+
+    def newest(self, ref: str, date: str | None = None, mode: str | None = None) -> HistoryEntry | None:
+        """
+        Get the newest commit of the ref
+
+        :param ref: ref (e.g. altcos/x86_64/p10/base)
+        :type ref: str
+        :param date: the newest commit at or before the date (e.g. 20230201)
+        :type date: str | None
+        :param mode: repository mode (any if not set)
+        :type mode: str | None
+        :return: indexed commit if exists
+        :rtype: HistoryEntry | None
+        """
+        if date is None:
+            entries = self._select("ref = ?", (ref,), mode, 1)
+        else:
+            entries = self._select("ref = ? AND date <= ?", (ref, date), mode, 1)
+
+        return entries[0] if entries else None
+
+    def versions(self, ref: str, mode: str | None = None) -> list[HistoryEntry]:
+        """
+        Get all the indexed commits of the ref
+
+        :param ref: ref (e.g. altcos/x86_64/p10/base)
+        :type ref: str
+        :param mode: repository mode (any if not set)
+        :type mode: str | None
+        :return: commits from the newest
+        :rtype: list[HistoryEntry]
+        """
+        return self._select("ref = ?", (ref,), mode)
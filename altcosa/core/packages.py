@@ -0,0 +1,479 @@
+from __future__ import annotations
+
+import array
+import bisect
+import dataclasses
+import fcntl
+import json
+import multiprocessing
+import os
+import pathlib
+import sys
+import tempfile
+import typing
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from altcosa.core.alt import Commit, REPOSITORY_POOL, Repository, Stream, gi_modules
+from altcosa.core.cache import CACHE_DIR, DiskCache
+
+if typing.TYPE_CHECKING:
+    from gi.repository import Gio  # type: ignore
+
+
+PACKAGES_PATH = "lib/rpm/Packages"
+PACKAGES_CACHE_DIR = CACHE_DIR.joinpath("packages")
+PACKAGES_CACHE_SIZE = 128 * 1024 ** 2
+# epoch of the package without the epoch at the PackageSet arrays
+NO_EPOCH = -1
+# ioctl sharing the extents of the files (reflink) on btrfs, XFS, ...
+FICLONE = 0x40049409
+
+
+def copy_file(source: pathlib.Path, target: pathlib.Path) -> None:
+    """
+    Copy the file at the kernel: reflink it if the filesystem can, use copy_file_range otherwise
+
+    :param source: source file
+    :type source: pathlib.Path
+    :param target: target file, must not exist
+    :type target: pathlib.Path
+    :raises OSError: if the kernel can't copy the file
+    """
+    with open(source, "rb") as source_file, open(target, "xb") as target_file:
+        try:
+            fcntl.ioctl(target_file.fileno(), FICLONE, source_file.fileno())
+            return
+        except OSError:
+            pass
+
+        remaining = os.fstat(source_file.fileno()).st_size
+
+        while remaining > 0 and (count := os.copy_file_range(source_file.fileno(), target_file.fileno(), remaining)):
+            remaining -= count
+
+
+@dataclasses.dataclass(frozen=True, slots=True, eq=False)
+class Package:
+    """
+    Installed package, packages are compared by EVR
+    """
+    name: str
+    epoch: int | None
+    version: str
+    release: str
+    summary: str
+
+    @classmethod
+    def from_header(cls, header: typing.Any) -> typing.Self:
+        """
+        Decode the rpm header
+
+        :param header: rpm header
+        :type header: rpm.hdr
+        :return: instance of Package
+        :rtype: typing.Self
+        """
+        import rpm  # type: ignore
+
+        return cls(
+            header[rpm.RPMTAG_NAME].decode(),
+            header[rpm.RPMTAG_EPOCH],
+            header[rpm.RPMTAG_VERSION].decode(),
+            header[rpm.RPMTAG_RELEASE].decode(),
+            header[rpm.RPMTAG_SUMMARY].decode(),
+        )
+
+    def evr(self) -> tuple[str, str, str]:
+        return str(self.epoch or 0), self.version, self.release
+
+    def compare(self, other: Package) -> int:
+        import rpm
+
+        return int(rpm.labelCompare(self.evr(), other.evr()))
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Package) and self.compare(other) == 0
+
+    def __lt__(self, other: Package) -> bool:
+        return self.compare(other) < 0
+
+    def __gt__(self, other: Package) -> bool:
+        return self.compare(other) > 0
+
+    def to_dict(self) -> dict[str, typing.Any]:
+        return {
+            "name": self.name,
+            "version": self.version,
+            "release": self.release,
+            "epoch": self.epoch,
+            "summary": self.summary,
+        }
+
+
+PackageRow: typing.TypeAlias = tuple[str, int | None, str, str, str]
+
+
+class PackageSet:
+    """
+    Installed packages of the commit as the arrays sorted by name
+
+    Only name, EVR and summary are stored, strings are interned, so the sets
+    of many commits share the unchanged values. Package instances are made on access,
+    diffs walk the sorted names of both sets at once.
+    """
+    __slots__ = ("names", "epochs", "versions", "releases", "summaries")
+
+    def __init__(self, rows: typing.Iterable[PackageRow] = ()) -> None:
+        """
+        :param rows: (name, epoch, version, release, summary), the last row of the name wins
+        :type rows: typing.Iterable[PackageRow]
+        """
+        intern = sys.intern
+        by_name = {row[0]: row for row in rows}
+        ordered = [by_name[name] for name in sorted(by_name)]
+
+        self.names = [intern(row[0]) for row in ordered]
+        self.epochs = array.array("q", (NO_EPOCH if row[1] is None else row[1] for row in ordered))
+        self.versions = [intern(row[2]) for row in ordered]
+        self.releases = [intern(row[3]) for row in ordered]
+        self.summaries = [intern(row[4]) for row in ordered]
+
+    @classmethod
+    def from_packages(cls, packages: typing.Iterable[Package]) -> typing.Self:
+        return cls((package.name, package.epoch, package.version, package.release, package.summary)
+                   for package in packages)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __iter__(self) -> typing.Iterator[Package]:
+        return map(self.package, range(len(self.names)))
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and self._index(name) is not None
+
+    def _index(self, name: str) -> int | None:
+        index = bisect.bisect_left(self.names, name)
+        return index if index < len(self.names) and self.names[index] == name else None
+
+    def _epoch(self, index: int) -> int | None:
+        return None if (epoch := self.epochs[index]) == NO_EPOCH else epoch
+
+    def _evr(self, index: int) -> tuple[str, str, str]:
+        return str(max(self.epochs[index], 0)), self.versions[index], self.releases[index]
+
+    def _same_evr(self, index: int, other: PackageSet, other_index: int) -> bool:
+        return (self.epochs[index] == other.epochs[other_index]
+                and self.versions[index] == other.versions[other_index]
+                and self.releases[index] == other.releases[other_index])
+
+    def package(self, index: int) -> Package:
+        return Package(
+            self.names[index],
+            self._epoch(index),
+            self.versions[index],
+            self.releases[index],
+            self.summaries[index],
+        )
+
+    def get(self, name: str) -> Package | None:
+        """
+        Get the package by name
+
+        :param name: package name
+        :type name: str
+        :return: package if installed
+        :rtype: Package | None
+        """
+        return None if (index := self._index(name)) is None else self.package(index)
+
+    def rows(self) -> list[PackageRow]:
+        return [(self.names[index], self._epoch(index), self.versions[index], self.releases[index],
+                 self.summaries[index]) for index in range(len(self.names))]
+
+    def _merge(self, other: PackageSet) -> typing.Iterator[tuple[int | None, int | None]]:
+        """
+        Walk the sorted names of both sets
+
+        :return: indexes of the name at the sets (None if the set doesn't have it)
+        :rtype: typing.Iterator[tuple[int | None, int | None]]
+        """
+        names, other_names = self.names, other.names
+        index = other_index = 0
+
+        while index < len(names) or other_index < len(other_names):
+            if other_index == len(other_names) or (index < len(names) and names[index] < other_names[other_index]):
+                yield index, None
+                index += 1
+            elif index == len(names) or other_names[other_index] < names[index]:
+                yield None, other_index
+                other_index += 1
+            else:
+                yield index, other_index
+                index += 1
+                other_index += 1
+
+    def unique(self, other: PackageSet) -> list[Package]:
+        """
+        Get the packages the other set doesn't have
+
+        :param other: set to compare with
+        :type other: PackageSet
+        :return: packages sorted by name
+        :rtype: list[Package]
+        """
+        return [self.package(index) for index, other_index in self._merge(other)
+                if index is not None and other_index is None]
+
+    def updated(self, other: PackageSet) -> list[tuple[Package, Package]]:
+        """
+        Get the packages that are newer than at the other set
+
+        :param other: set to compare with
+        :type other: PackageSet
+        :return: (package, other set package) pairs sorted by name
+        :rtype: list[tuple[Package, Package]]
+        """
+        import rpm
+
+        return [
+            (self.package(index), other.package(other_index))
+            for index, other_index in self._merge(other)
+            if index is not None and other_index is not None
+            and not self._same_evr(index, other, other_index)
+            and rpm.labelCompare(self._evr(index), other._evr(other_index)) > 0
+        ]
+
+
+class BDBReader:
+    """
+    Berkeley DB reader for OSTree repository
+    """
+    __slots__ = ("repository", "source")
+
+    def __init__(self, repository: Repository, source: Gio.File) -> None:
+        """
+        :param repository: repository of the commit
+        :type repository: Repository
+        :param source: /lib/rpm/Packages of the commit tree (OSTree.RepoFile)
+        :type source: Gio.File
+        """
+        self.repository = repository
+        self.source = source
+
+    @classmethod
+    def from_commit(cls, commit: Commit) -> typing.Self:
+        """
+        Get the Packages DB from the given commit
+
+        :param commit: commit hashsum
+        :type commit: Commit
+        :return: BDBReader instance
+        :rtype: typing.Self
+        """
+        _, root, _ = commit.repository.storage.read_commit(commit.hashsum, None)
+        return cls(commit.repository, root.resolve_relative_path(PACKAGES_PATH))
+
+    @property
+    def checksum(self) -> str:
+        """
+        Get the content checksum of the Packages DB (the same for bare and archive repositories)
+
+        :return: checksum
+        :rtype: str
+        """
+        self.source.ensure_resolved()
+        return str(self.source.get_checksum())
+
+    def _object_path(self) -> pathlib.Path | None:
+        """
+        Get the path of the Packages object if the repository stores it as is (bare mode)
+        """
+        if self.repository.mode != gi_modules().OSTree.RepoMode.BARE:
+            return None
+
+        checksum = self.checksum
+
+        return self.repository.path.joinpath("objects", checksum[:2], f"{checksum[2:]}.file")
+
+    def extract(self, path: pathlib.Path) -> None:
+        """
+        Place the Packages DB to the path: copy the bare repository object at the kernel
+        if possible, otherwise splice the object content to the file (no copy in the memory).
+        rpm may write to the database, so the object itself is never linked.
+
+        :param path: target path (<dbpath>/Packages)
+        :type path: pathlib.Path
+        """
+        Gio = gi_modules().Gio
+
+        if (object_path := self._object_path()) is not None:
+            try:
+                copy_file(object_path, path)
+                return
+            except OSError:
+                path.unlink(missing_ok=True)
+
+        target = Gio.File.new_for_path(str(path)).create(Gio.FileCreateFlags.NONE, None)
+        target.splice(
+            self.source.read(None),
+            Gio.OutputStreamSpliceFlags.CLOSE_SOURCE | Gio.OutputStreamSpliceFlags.CLOSE_TARGET,
+            None,
+        )
+
+    def translate(self) -> PackageSet:
+        """
+        Translate raw package information to the package set
+
+        :return: installed packages
+        :rtype: PackageSet
+        """
+        import rpm
+
+        # temporary dbpath at the repository filesystem to reflink the object
+        tmp_dir = self.repository.path.joinpath("tmp")
+
+        with tempfile.TemporaryDirectory(prefix="pkgdiff", dir=tmp_dir if tmp_dir.is_dir() else None) as dbpath:
+            self.extract(pathlib.Path(dbpath, "Packages"))
+
+            rpm.addMacro("_dbpath", dbpath)
+
+            try:
+                return PackageSet.from_packages(map(Package.from_header, rpm.TransactionSet().dbMatch()))
+            finally:
+                rpm.delMacro("_dbpath")
+
+
+def _init_worker() -> None:
+    # repository handles of the parent process are not used by the forked worker
+    REPOSITORY_POOL.clear()
+
+
+def _translate(stream: Stream, mode: int, hashsum: str) -> list[PackageRow]:
+    """
+    Parse the Packages DB of the commit (called at the worker process,
+    so every worker has its own `_dbpath` macro)
+    """
+    repository = Repository(stream, gi_modules().OSTree.RepoMode(mode))
+    return BDBReader.from_commit(Commit(repository, hashsum)).translate().rows()
+
+
+class PackagesCache:
+    """
+    Parsed Packages DBs keyed by the Packages content checksum
+
+    Commits that don't touch the rpmdb share the entry, so the parent of the last
+    diffed commit is read from the cache. Entries are zlib-compressed JSON rows
+    (name, epoch, version, release, summary).
+    """
+    __slots__ = ("storage",)
+
+    def __init__(self, storage: DiskCache | None = None) -> None:
+        self.storage = storage or DiskCache(PACKAGES_CACHE_DIR, PACKAGES_CACHE_SIZE)
+
+    def get(self, checksum: str) -> PackageSet | None:
+        """
+        Get the parsed Packages DB
+
+        :param checksum: Packages content checksum
+        :type checksum: str
+        :return: packages if cached
+        :rtype: PackageSet | None
+        """
+        if (data := self.storage.get(checksum)) is None:
+            return None
+
+        try:
+            rows = json.loads(zlib.decompress(data))
+        except (zlib.error, ValueError):
+            self.storage.remove(checksum)
+            return None
+
+        return PackageSet(rows)
+
+    def put(self, checksum: str, packages: PackageSet) -> None:
+        """
+        Store the parsed Packages DB
+
+        :param checksum: Packages content checksum
+        :type checksum: str
+        :param packages: packages
+        :type packages: PackageSet
+        """
+        self.storage.put(checksum, zlib.compress(json.dumps(packages.rows(), separators=(",", ":")).encode()))
+
+    def read(self, commit: Commit, rebuild: bool = False) -> PackageSet:
+        """
+        Get the packages of the commit, the Packages DB is parsed on the cache miss only
+
+        :param commit: commit
+        :type commit: Commit
+        :param rebuild: parse the Packages DB and replace the cached entry
+        :type rebuild: bool
+        :return: installed packages
+        :rtype: PackageSet
+        """
+        reader = BDBReader.from_commit(commit)
+        checksum = reader.checksum
+
+        if not rebuild and (packages := self.get(checksum)) is not None:
+            return packages
+
+        packages = reader.translate()
+        self.put(checksum, packages)
+
+        return packages
+
+    def read_many(
+        self,
+        commits: list[Commit],
+        workers: int | None = None,
+        rebuild: bool = False,
+    ) -> dict[str, PackageSet]:
+        """
+        Get the packages of the commits, every Packages DB missing from the cache
+        is parsed once at the pool of `workers` processes
+
+        :param commits: commits of the repository
+        :type commits: list[Commit]
+        :param workers: number of the processes (default: number of CPUs)
+        :type workers: int | None
+        :param rebuild: parse the Packages DBs and replace the cached entries
+        :type rebuild: bool
+        :return: packages by commit hashsum
+        :rtype: dict[str, PackageSet]
+        """
+        checksums = {commit.hashsum: BDBReader.from_commit(commit).checksum for commit in commits}
+        parsed: dict[str, PackageSet] = {}
+        # one commit per Packages DB to parse
+        missing: dict[str, Commit] = {}
+
+        for commit in commits:
+            checksum = checksums[commit.hashsum]
+            if checksum in parsed or checksum in missing:
+                continue
+
+            if not rebuild and (packages := self.get(checksum)) is not None:
+                parsed[checksum] = packages
+            else:
+                missing[checksum] = commit
+
+        if missing:
+            with ProcessPoolExecutor(
+                workers or os.cpu_count(),
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_worker,
+            ) as pool:
+                results = pool.map(
+                    _translate,
+                    [commit.repository.stream for commit in missing.values()],
+                    [int(commit.repository.mode) for commit in missing.values()],
+                    [commit.hashsum for commit in missing.values()],
+                )
+
+                for checksum, rows in zip(missing, results):
+                    parsed[checksum] = PackageSet(rows)
+                    self.put(checksum, parsed[checksum])
+
+        return {hashsum: parsed[checksum] for hashsum, checksum in checksums.items()}
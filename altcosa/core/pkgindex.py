@@ -0,0 +1,293 @@
+from __future__ import annotations
+
+import dataclasses
+import pathlib
+import sqlite3
+import typing
+
+from altcosa.core.alt import Commit, Repository
+from altcosa.core.packages import BDBReader, PackagesCache
+
+
+INDEX_FILE = "packages.sqlite"
+
+# index of the older schema is rebuilt
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commits (
+    stream TEXT NOT NULL,
+    hashsum TEXT NOT NULL,
+    version TEXT,
+    timestamp INTEGER NOT NULL,
+    rpmdb TEXT NOT NULL,
+    PRIMARY KEY (stream, hashsum)
+);
+CREATE INDEX IF NOT EXISTS commits_rpmdb ON commits (rpmdb);
+CREATE TABLE IF NOT EXISTS packages (
+    rpmdb TEXT NOT NULL,
+    name TEXT NOT NULL,
+    epoch INTEGER,
+    version TEXT NOT NULL,
+    release TEXT NOT NULL,
+    PRIMARY KEY (rpmdb, name)
+);
+CREATE INDEX IF NOT EXISTS packages_name ON packages (name);
+"""
+
+COLUMNS = "p.name, c.stream, c.hashsum, c.version, c.timestamp, p.epoch, p.version, p.release"
+
+
+def parse_evr(evr: str) -> tuple[str, str, str | None]:
+    """
+    Parse the EVR string
+
+    :param evr: [epoch:]version[-release] (e.g. 3.0.0, 1:3.0.8-alt1)
+    :type evr: str
+    :return: epoch (0 if not set), version and release (None if not set)
+    :rtype: tuple[str, str, str | None]
+    """
+    epoch, _, version = evr.rpartition(":")
+    version, _, release = version.partition("-")
+
+    return epoch or "0", version, release or None
+
+
+def native_version(commit: Commit) -> str | None:
+    """
+    Get the native version of the commit
+
+    :param commit: commit
+    :type commit: Commit
+    :return: native version (e.g. 20230201.4.1), None if the commit has no valid one
+    :rtype: str | None
+    """
+    try:
+        return str(commit.version)
+    except ValueError:
+        return None
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class PackageEntry:
+    """
+    Package shipped by the commit of the stream
+
+    version - commit native version (None if the commit has no version)
+    timestamp - commit time (unix time, s)
+    """
+    name: str
+    stream: str
+    commit: str
+    version: str | None
+    timestamp: int
+    package_epoch: int | None
+    package_version: str
+    package_release: str
+
+    @property
+    def evr(self) -> str:
+        epoch = f"{self.package_epoch}:" if self.package_epoch else ""
+        return f"{epoch}{self.package_version}-{self.package_release}"
+
+    def compare(self, evr: str) -> int:
+        """
+        Compare the package EVR with the given one, the release isn't compared if not set
+
+        :param evr: [epoch:]version[-release]
+        :type evr: str
+        :return: -1, 0 or 1
+        :rtype: int
+        """
+        import rpm  # type: ignore
+
+        epoch, version, release = parse_evr(evr)
+        own_release = None if release is None else self.package_release
+
+        return int(rpm.labelCompare(
+            (str(self.package_epoch or 0), self.package_version, own_release),
+            (epoch, version, release),
+        ))
+
+
+class PackageIndex:
+    """
+    Inverted index of the packages of every commit of the streams (SQLite database)
+
+    Packages are stored once per Packages DB, commits that don't touch the rpmdb
+    only refer to it. Index is updated with the commits the streams got since
+    the last update, new Packages DBs are read through PackagesCache.
+    """
+    __slots__ = ("path",)
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+
+    @classmethod
+    def for_repodir(cls, repodir: str) -> typing.Self:
+        """
+        Get the index of the ALTCOS repository directory
+
+        :param repodir: ALTCOS repository directory
+        :type repodir: str
+        :return: instance of PackageIndex
+        :rtype: typing.Self
+        """
+        return cls(pathlib.Path(repodir, INDEX_FILE))
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+
+        if connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            with connection:
+                connection.execute("DROP TABLE IF EXISTS commits")
+                connection.execute("DROP TABLE IF EXISTS packages")
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _select(self, where: str, params: tuple[typing.Any, ...]) -> list[PackageEntry]:
+        if not self.path.exists():
+            return []
+
+        query = (f"SELECT {COLUMNS} FROM packages p JOIN commits c ON c.rpmdb = p.rpmdb "
+                 f"WHERE {where} ORDER BY c.timestamp")
+
+        connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=30)
+        try:
+            return [PackageEntry(*row) for row in connection.execute(query, params)]
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _new_commits(connection: sqlite3.Connection, repository: Repository) -> list[Commit]:
+        """
+        Walk the stream commits from the head up to the first indexed one
+        """
+        commits: list[Commit] = []
+
+        if (head := repository.last_commit()) is None:
+            return commits
+
+        for commit in head.ancestors():
+            if connection.execute(
+                "SELECT 1 FROM commits WHERE stream = ? AND hashsum = ?", (str(repository.stream), commit.hashsum),
+            ).fetchone():
+                break
+            commits.append(commit)
+
+        return commits
+
+    @staticmethod
+    def _has_rpmdb(connection: sqlite3.Connection, rpmdb: str) -> bool:
+        return connection.execute("SELECT 1 FROM commits WHERE rpmdb = ?", (rpmdb,)).fetchone() is not None
+
+    def update(self, repository: Repository, cache: PackagesCache | None = None, workers: int | None = None) -> int:
+        """
+        Index the commits the repository stream got since the last update
+
+        :param repository: repository of the stream
+        :type repository: Repository
+        :param cache: parsed Packages DBs cache
+        :type cache: PackagesCache | None
+        :param workers: number of the processes parsing the Packages DBs
+        :type workers: int | None
+        :return: number of the indexed commits
+        :rtype: int
+        """
+        cache = cache or PackagesCache()
+        connection = self._connect()
+
+        try:
+            commits = self._new_commits(connection, repository)
+            rpmdbs = {commit.hashsum: BDBReader.from_commit(commit).checksum for commit in commits}
+            # one commit per Packages DB the index doesn't have
+            unknown: dict[str, Commit] = {}
+
+            for commit in commits:
+                rpmdb = rpmdbs[commit.hashsum]
+                if rpmdb not in unknown and not self._has_rpmdb(connection, rpmdb):
+                    unknown[rpmdb] = commit
+
+            packages = cache.read_many(list(unknown.values()), workers)
+
+            with connection:
+                for rpmdb, commit in unknown.items():
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO packages (rpmdb, name, epoch, version, release) VALUES (?, ?, ?, ?, ?)",
+                        [(rpmdb, *row[:4]) for row in packages[commit.hashsum].rows()],
+                    )
+
+                connection.executemany(
+                    "INSERT INTO commits (stream, hashsum, version, timestamp, rpmdb) VALUES (?, ?, ?, ?, ?)",
+                    [(str(repository.stream), commit.hashsum, native_version(commit), commit.timestamp,
+                      rpmdbs[commit.hashsum]) for commit in commits],
+                )
+        finally:
+            connection.close()
+
+        return len(commits)
+
+    def find(self, name: str, stream: str | None = None) -> list[PackageEntry]:
+        """
+        Get the commits shipping the package
+
+        :param name: package name
+        :type name: str
+        :param stream: stream (any if not set)
+        :type stream: str | None
+        :return: entries from the oldest commit
+        :rtype: list[PackageEntry]
+        """
+        if stream is None:
+            return self._select("p.name = ?", (name,))
+
+        return self._select("p.name = ? AND c.stream = ?", (name, stream))
+
+    def below(self, name: str, evr: str, stream: str | None = None) -> list[PackageEntry]:
+        """
+        Get the commits shipping the package older than the EVR
+
+        :param name: package name
+        :type name: str
+        :param evr: [epoch:]version[-release] (e.g. 3.0.8)
+        :type evr: str
+        :param stream: stream (any if not set)
+        :type stream: str | None
+        :return: entries from the oldest commit
+        :rtype: list[PackageEntry]
+        """
+        return [entry for entry in self.find(name, stream) if entry.compare(evr) < 0]
+
+    def first(self, name: str, stream: str | None = None) -> dict[str, PackageEntry]:
+        """
+        Get the first commit of every stream shipping the package
+
+        :param name: package name
+        :type name: str
+        :param stream: stream (any if not set)
+        :type stream: str | None
+        :return: entries by stream
+        :rtype: dict[str, PackageEntry]
+        """
+        first: dict[str, PackageEntry] = {}
+
+        for entry in self.find(name, stream):
+            first.setdefault(entry.stream, entry)
+
+        return first
+
+    def export(self) -> dict[str, dict[str, dict[str, str]]]:
+        """
+        Get the whole index
+
+        :return: package name -> stream -> commit version (hashsum if none) -> package EVR
+        :rtype: dict[str, dict[str, dict[str, str]]]
+        """
+        result: dict[str, dict[str, dict[str, str]]] = {}
+
+        for entry in self._select("1", ()):
+            result.setdefault(entry.name, {}).setdefault(entry.stream, {})[entry.version or entry.commit] = entry.evr
+
+        return result
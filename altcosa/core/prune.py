@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import dataclasses
+import json
+import os
+import pathlib
+import shutil
+import time
+import typing
+
+from altcosa.core.alt import Commit, REPOSITORY_POOL, Repository, Stream, gi_modules
+from altcosa.core.history import mode_name
+
+if typing.TYPE_CHECKING:
+    from gi.repository import OSTree  # type: ignore
+
+
+@dataclasses.dataclass
+class RetentionPolicy:
+    """
+    Commits of the stream to keep, the commit is kept if any rule keeps it
+
+    keep_last - number of the last commits
+    keep_days - commits newer than the number of days
+    keep_versions - native versions (e.g. referenced by the builds summary)
+
+    History is cut after the oldest kept commit, the head is always kept.
+    """
+    keep_last: int | None = None
+    keep_days: float | None = None
+    keep_versions: set[str] = dataclasses.field(default_factory=set)
+
+    def keeps(self, index: int, commit: Commit, now: float) -> bool:
+        """
+        Check the policy keeps the commit
+
+        :param index: commit index from the head
+        :type index: int
+        :param commit: commit
+        :type commit: Commit
+        :param now: current time (unix time, s)
+        :type now: float
+        :return: True if the commit is kept
+        :rtype: bool
+        """
+        if self.keep_last is not None and index < self.keep_last:
+            return True
+
+        if self.keep_days is not None and now - commit.timestamp < self.keep_days * 86400:
+            return True
+
+        return commit.meta.version is not None and str(commit.version) in self.keep_versions
+
+    def depth(self, commits: list[Commit], now: float | None = None) -> int:
+        """
+        Get the number of the commits from the head to keep
+
+        :param commits: commits from the head
+        :type commits: list[Commit]
+        :param now: current time (unix time, s)
+        :type now: float | None
+        :return: number of the commits
+        :rtype: int
+        """
+        now = time.time() if now is None else now
+        kept = [index for index, commit in enumerate(commits) if self.keeps(index, commit, now)]
+
+        return max(kept, default=0) + 1
+
+
+def buildsum_versions(summary_path: pathlib.Path, stream: Stream) -> set[str]:
+    """
+    Get the stream versions referenced by the builds summary (see `cmd-buildsum.py`)
+
+    :param summary_path: builds summary file (<storage>/<branch>.json)
+    :type summary_path: pathlib.Path
+    :param stream: stream
+    :type stream: Stream
+    :raises FileNotFoundError: if the summary doesn't exist (versions of the published builds are unknown)
+    :return: native versions
+    :rtype: set[str]
+    """
+    with open(summary_path) as file:
+        summary = json.load(file)
+
+    return set(summary.get(stream.branch, {}).get(stream.arch, {}).get(stream.name, {}))
+
+
+def _tree_size(path: pathlib.Path) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        size += sum(os.lstat(os.path.join(root, name)).st_size for name in files)
+    return size
+
+
+@dataclasses.dataclass
+class PruneReport:
+    """
+    Prune result of the repository
+
+    commits - commits removed from the history (or to be removed at dry-run)
+    objects, size - pruned objects and their size
+    vars_dirs, vars_size - removed stale `var` snapshots and their size
+    """
+    repository: str
+    dry_run: bool
+    commits: list[str] = dataclasses.field(default_factory=list)
+    objects: int = 0
+    size: int = 0
+    vars_dirs: int = 0
+    vars_size: int = 0
+
+
+class Pruner:
+    """
+    Retention policies applied to the bare and archive repositories and the vars directories
+
+    Commits older than the oldest kept one are deleted from every ref with the policy
+    (refs without the policy are kept as is), then objects unreachable from the refs
+    are pruned and `var` snapshots of the deleted commits are removed, all in one pass.
+    Dry-run only counts what would be removed.
+    """
+    __slots__ = ("policies", "dry_run")
+
+    def __init__(self, policies: dict[str, RetentionPolicy], dry_run: bool = False) -> None:
+        self.policies = policies
+        self.dry_run = dry_run
+
+    def plan(self, repository: Repository) -> tuple[list[Commit], dict[str, list[Commit]]]:
+        """
+        Split the commits of the repository refs to the kept and deleted ones
+
+        :param repository: repository
+        :type repository: Repository
+        :return: kept commits of the refs with the policy and deleted commits by ref
+        :rtype: tuple[list[Commit], dict[str, list[Commit]]]
+        """
+        kept: list[Commit] = []
+        deleted: dict[str, list[Commit]] = {}
+        # whole history of the refs without the policy is kept
+        kept_hashsums: set[str] = set()
+
+        for ref, hashsum in sorted(repository.storage.list_refs(None, None)[1].items()):
+            commits = list(Commit(repository, hashsum).ancestors())
+
+            if (policy := self.policies.get(ref)) is None:
+                kept_hashsums.update(commit.hashsum for commit in commits)
+                continue
+
+            depth = policy.depth(commits)
+            kept.extend(commits[:depth])
+            deleted[ref] = commits[depth:]
+
+        kept_hashsums.update(commit.hashsum for commit in kept)
+        for ref, commits in deleted.items():
+            deleted[ref] = [commit for commit in commits if commit.hashsum not in kept_hashsums]
+
+        return kept, deleted
+
+    def _reclaimable(self, repository: Repository, kept: list[Commit], deleted: list[Commit]) -> tuple[int, int]:
+        """
+        Count the objects reachable from the deleted commits only
+        """
+        storage = repository.storage
+        deserialize = gi_modules().OSTree.object_name_deserialize
+
+        def reachable(hashsum: str, depth: int) -> set[tuple[str, OSTree.ObjectType]]:
+            return {deserialize(name) for name in storage.traverse_commit(hashsum, depth, None)[1]}
+
+        live: set[tuple[str, OSTree.ObjectType]] = set()
+        for ref, hashsum in storage.list_refs(None, None)[1].items():
+            if ref not in self.policies:
+                live |= reachable(hashsum, -1)
+        for commit in kept:
+            live |= reachable(commit.hashsum, 0)
+
+        doomed: set[tuple[str, OSTree.ObjectType]] = set()
+        for commit in deleted:
+            doomed |= reachable(commit.hashsum, 0)
+        doomed -= live
+
+        return len(doomed), sum(storage.query_object_storage_size(objtype, checksum, None)[1]
+                                for checksum, objtype in doomed)
+
+    def prune_vars(self, stream: Stream, deleted: list[Commit], report: PruneReport) -> None:
+        """
+        Remove `var` snapshots of the deleted commits, the symlinks to the missing snapshots
+        and the empty version directories
+
+        :param stream: stream
+        :type stream: Stream
+        :param deleted: deleted commits of the stream
+        :type deleted: list[Commit]
+        :param report: report to update
+        :type report: PruneReport
+        """
+        for commit in deleted:
+            if commit.meta.version is None:
+                continue
+
+            if (var_dir := stream.vars_dir.joinpath(commit.version.like_path())).is_dir():
+                report.vars_dirs += 1
+                report.vars_size += _tree_size(var_dir)
+                if not self.dry_run:
+                    shutil.rmtree(var_dir)
+
+        if not self.dry_run and stream.vars_dir.is_dir():
+            self._remove_dangling(stream.vars_dir)
+
+    @staticmethod
+    def _remove_dangling(vars_dir: pathlib.Path) -> None:
+        """
+        Remove the commit symlinks to the missing snapshots and the empty version directories
+        """
+        for entry in vars_dir.iterdir():
+            if entry.is_symlink() and not entry.exists():
+                entry.unlink()
+
+        for root, dirs, _ in os.walk(vars_dir, topdown=False):
+            for name in dirs:
+                if not os.path.islink(path := os.path.join(root, name)) and not os.listdir(path):
+                    os.rmdir(path)
+
+    def prune_repository(self, repository: Repository, with_vars: bool = False) -> PruneReport:
+        """
+        Delete the commits the policies don't keep and prune the unreachable objects
+
+        :param repository: repository
+        :type repository: Repository
+        :param with_vars: remove `var` snapshots of the deleted commits
+        :type with_vars: bool
+        :return: report
+        :rtype: PruneReport
+        """
+        OSTree = gi_modules().OSTree
+        report = PruneReport(str(repository.path), self.dry_run)
+
+        kept, deleted = self.plan(repository)
+        deleted_commits = [commit for commits in deleted.values() for commit in commits]
+        report.commits = [commit.hashsum for commit in deleted_commits]
+
+        # versions are read before the commits are deleted
+        if with_vars:
+            for ref, commits in deleted.items():
+                self.prune_vars(Stream.from_str(repository.stream.repodir, ref), commits, report)
+
+        if self.dry_run:
+            report.objects, report.size = self._reclaimable(repository, kept, deleted_commits)
+            return report
+
+        storage = repository.storage
+        for commit in deleted_commits:
+            storage.delete_object(OSTree.ObjectType.COMMIT, commit.hashsum, None)
+
+        _, _, report.objects, report.size = storage.prune(OSTree.RepoPruneFlags.REFS_ONLY, -1, None)
+        REPOSITORY_POOL.invalidate(repository.path)
+
+        if deleted_commits:
+            repository.history().remove(report.commits, mode_name(repository.mode))
+
+            if repository.mode == OSTree.RepoMode.ARCHIVE:
+                storage.regenerate_summary(None, None)
+
+        return report
+
+    def prune(self, streams: list[Stream]) -> list[PruneReport]:
+        """
+        Prune the bare and archive repositories of the streams and the vars directories
+        of the bare repositories refs
+
+        :param streams: streams of the repositories (one per OSTree directory is enough)
+        :type streams: list[Stream]
+        :return: reports of the repositories
+        :rtype: list[PruneReport]
+        """
+        OSTree = gi_modules().OSTree
+        reports = []
+
+        for stream in {stream.ostree_dir: stream for stream in streams}.values():
+            if stream.ostree_bare_dir.is_dir():
+                reports.append(self.prune_repository(Repository(stream, OSTree.RepoMode.BARE), with_vars=True))
+
+            if stream.ostree_archive_dir.is_dir():
+                reports.append(self.prune_repository(Repository(stream, OSTree.RepoMode.ARCHIVE)))
+
+        return reports
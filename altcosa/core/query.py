@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socketserver
+import typing
+
+from altcosa.core.alt import Commit, OSTree, Repository, Stream, Version
+from altcosa.core.history import History
+
+
+SOCKET_ENV = "ALTCOSA_QUERY_SOCKET"
+
+
+class QueryError(Exception):
+    pass
+
+
+class Resolver:
+    """
+    Stream, commit and version lookups, repositories handles are kept
+    between queries by the repository pool
+    """
+    __slots__ = ()
+
+    def repository(self, stream: Stream, mode: str) -> Repository:
+        """
+        Get the opened repository of the stream
+
+        :param stream: repository stream
+        :type stream: Stream
+        :param mode: repository mode (bare|archive)
+        :type mode: str
+        :return: opened repository
+        :rtype: Repository
+        """
+        return Repository(stream, OSTree.RepoMode.BARE if mode == "bare" else OSTree.RepoMode.ARCHIVE)
+
+    def export(self, stream: str, repodir: str) -> str:
+        return Stream.from_str(repodir, stream).export()
+
+    def export_parts(self, arch: str, branch: str, repodir: str, name: str = "base") -> str:
+        return Stream(repodir, "altcos", arch, branch, name).export()  # type: ignore
+
+    def commit(self, stream: str, repodir: str, mode: str) -> str:
+        if (commit := self.repository(Stream.from_str(repodir, stream), mode).last_commit()) is None:
+            raise QueryError("no one commit found")
+        return str(commit)
+
+    def version(self, stream: str, repodir: str, commit: str = "", inc_part: str = "") -> str:
+        """
+        Get all the version views of the commit (latest if not set)
+        the same way `cmd-ver.py` does
+
+        :return: bash export-like string (see `Version.export`)
+        :rtype: str
+        """
+        parsed_stream = Stream.from_str(repodir, stream)
+
+        if commit and (entry := History.for_stream(parsed_stream).get(commit)) and entry.full_version:
+            return Version.from_str(entry.full_version).increment(inc_part).export()
+
+        repository = self.repository(parsed_stream, "bare")
+
+        if commit:
+            if not (found := Commit(repository, commit)).exists():
+                raise QueryError(f"Commit \"{commit}\" does not exist")
+            version = found.version
+        elif (last_commit := repository.last_commit()) is not None:
+            version = last_commit.version
+        elif inc_part:
+            return Version(0, 0, parsed_stream.branch, parsed_stream.name).export()
+        else:
+            raise QueryError("No one commit found")
+
+        return version.increment(inc_part).export()
+
+    def query(self, op: str, params: dict[str, str]) -> str:
+        """
+        Call the lookup by the operation name
+
+        :param op: operation name (export|export_parts|commit|version)
+        :type op: str
+        :param params: operation parameters
+        :type params: dict[str, str]
+        :raises QueryError: if the operation is unknown or failed
+        :return: operation result
+        :rtype: str
+        """
+        handlers: dict[str, typing.Callable[..., str]] = {
+            "export": self.export,
+            "export_parts": self.export_parts,
+            "commit": self.commit,
+            "version": self.version,
+        }
+
+        if (handler := handlers.get(op)) is None:
+            raise QueryError(f"unknown operation: \"{op}\"")
+
+        try:
+            return handler(**params)
+        except QueryError:
+            raise
+        except Exception as e:
+            raise QueryError(str(e))
+
+
+class QueryHandler(socketserver.StreamRequestHandler):
+    """
+    One JSON request per line: {"op": <operation>, <param>: <value>, ...}
+    One JSON response per line: {"ok": true, "result": <str>} or {"ok": false, "error": <str>}
+    """
+    server: QueryServer
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                params = json.loads(line)
+                response = {"ok": True, "result": self.server.resolver.query(params.pop("op"), params)}
+            except (QueryError, ValueError, KeyError, TypeError) as e:
+                response = {"ok": False, "error": str(e)}
+
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class QueryServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str) -> None:
+        if os.path.exists(path):
+            os.unlink(path)
+
+        self.resolver = Resolver()
+
+        old_umask = os.umask(0o077)
+        try:
+            super().__init__(path, QueryHandler)
+        finally:
+            os.umask(old_umask)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve stream, commit and version lookups for cmdlib.sh")
+    parser.add_argument(
+        "--socket",
+        help=f"unix socket path (default: ${SOCKET_ENV})",
+        default=os.getenv(SOCKET_ENV),
+    )
+
+    args = parser.parse_args()
+
+    if not args.socket:
+        parser.error("socket path is required")
+
+    with QueryServer(args.socket) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
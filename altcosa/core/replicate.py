@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import dataclasses
+import itertools
+import os
+import pathlib
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+from altcosa.core.alt import Commit, REPOSITORY_POOL, Repository, Stream, gi_modules
+
+if typing.TYPE_CHECKING:
+    from gi.repository import OSTree  # type: ignore
+
+
+ObjectName: typing.TypeAlias = tuple[str, "OSTree.ObjectType"]
+
+
+@dataclasses.dataclass
+class ReplicationReport:
+    """
+    Replication result of the stream
+
+    commit - replicated head
+    updated - archive ref is moved
+    size - bytes of the written objects (file objects are counted uncompressed)
+    """
+    stream: str
+    commit: str | None = None
+    updated: bool = False
+    commits: int = 0
+    objects: int = 0
+    size: int = 0
+
+
+class Writers:
+    """
+    Target repository handles of the writer threads
+
+    OSTree.Repo handle isn't thread-safe, so every writer thread opens its own
+    handle of the target and writes the objects at its own transaction.
+    """
+    __slots__ = ("path", "_local", "_handles", "_lock")
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._handles: list[OSTree.Repo] = []
+        self._lock = threading.Lock()
+
+    def get(self) -> OSTree.Repo:
+        """
+        Get the handle of the current thread, the transaction is prepared on the first call
+
+        :return: target repository at the opened transaction
+        :rtype: OSTree.Repo
+        """
+        if (storage := getattr(self._local, "storage", None)) is None:
+            gi = gi_modules()
+            storage = gi.OSTree.Repo.new(gi.Gio.file_new_for_path(str(self.path)))
+            storage.open(None)
+            storage.prepare_transaction(None)
+            self._local.storage = storage
+
+            with self._lock:
+                self._handles.append(storage)
+
+        return storage
+
+    def commit(self) -> None:
+        """
+        Commit the transactions of all the threads (the threads must be finished)
+        """
+        while self._handles:
+            self._handles.pop().commit_transaction(None)
+
+    def abort(self) -> None:
+        """
+        Abort the transactions of all the threads (the threads must be finished)
+        """
+        while self._handles:
+            self._handles.pop().abort_transaction(None)
+
+
+class Replicator:
+    """
+    Incremental bare -> archive replication of the streams
+
+    Only commits the archive repository doesn't have are walked (from the head
+    up to the first replicated commit), only their objects the archive doesn't have
+    are written. Objects are written by `workers` threads, every thread at its own
+    transaction (see `Writers`). Commits and refs are written at one transaction per
+    OSTree directory after the objects transactions are committed, so the interrupted
+    replication doesn't leave partial commits. Summary is regenerated once per archive.
+    """
+    __slots__ = ("workers",)
+
+    def __init__(self, workers: int | None = None) -> None:
+        self.workers = workers or os.cpu_count() or 1
+
+    @staticmethod
+    def missing_commits(source: Repository, target: Repository, head: str) -> list[str]:
+        """
+        Get the commits of the source history the target doesn't have
+
+        :param source: source (bare) repository
+        :type source: Repository
+        :param target: target (archive) repository
+        :type target: Repository
+        :param head: the newest commit to replicate
+        :type head: str
+        :return: missing commits from the oldest
+        :rtype: list[str]
+        """
+        COMMIT = gi_modules().OSTree.ObjectType.COMMIT
+        commits = []
+        commit = Commit(source, head)
+
+        while not target.storage.has_object(COMMIT, commit.hashsum, None)[1]:
+            commits.append(commit.hashsum)
+
+            # history may be cut (e.g. pulled with limited depth)
+            if (parent := commit.parent) is None or not parent.exists():
+                break
+            commit = parent
+
+        return commits[::-1]
+
+    def missing_objects(self, source: Repository, target: Repository, commits: list[str]) -> list[ObjectName]:
+        """
+        Get the objects of the commits the target doesn't have, commit objects are not included
+
+        :param source: source (bare) repository
+        :type source: Repository
+        :param target: target (archive) repository
+        :type target: Repository
+        :param commits: commits to replicate
+        :type commits: list[str]
+        :return: missing objects
+        :rtype: list[ObjectName]
+        """
+        OSTree = gi_modules().OSTree
+        objects: set[ObjectName] = set()
+
+        for hashsum in commits:
+            reachable = source.storage.traverse_commit(hashsum, 0, None)[1]
+            objects.update(OSTree.object_name_deserialize(name) for name in reachable)
+
+        candidates = [name for name in objects if name[1] != OSTree.ObjectType.COMMIT]
+
+        def missing(name: ObjectName) -> bool:
+            return not target.storage.has_object(name[1], name[0], None)[1]
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            return list(itertools.compress(candidates, pool.map(missing, candidates)))
+
+    @staticmethod
+    def _copy_object(source: Repository, target: OSTree.Repo, name: ObjectName) -> int:
+        """
+        Write the source object to the target
+
+        :return: written bytes
+        :rtype: int
+        """
+        OSTree = gi_modules().OSTree
+        checksum, objtype = name
+
+        if objtype == OSTree.ObjectType.FILE:
+            _, stream, info, xattrs = source.storage.load_file(checksum, None)
+            _, content, length = OSTree.raw_file_to_content_stream(stream, info, xattrs, None)
+            target.write_content(checksum, content, length, None)
+            return int(length)
+
+        variant = source.storage.load_variant(objtype, checksum)[1]
+        target.write_metadata(objtype, checksum, variant, None)
+
+        if objtype == OSTree.ObjectType.COMMIT:
+            if (detached := source.storage.read_commit_detached_metadata(checksum, None)[1]) is not None:
+                target.write_commit_detached_metadata(checksum, detached, None)
+
+        return int(variant.get_size())
+
+    def _replicate_stream(
+        self,
+        stream: Stream,
+        target: OSTree.Repo,
+        head: str | None = None,
+    ) -> ReplicationReport:
+        """
+        Write the missing commits and objects of the stream to the target at the opened transaction
+        """
+        OSTree = gi_modules().OSTree
+        report = ReplicationReport(str(stream))
+
+        source = Repository(stream, OSTree.RepoMode.BARE)
+        archive = Repository(stream, OSTree.RepoMode.ARCHIVE)
+
+        if head is None:
+            if (last_commit := source.last_commit()) is None:
+                return report
+            head = last_commit.hashsum
+
+        report.commit = head
+        commits = self.missing_commits(source, archive, head)
+        objects = self.missing_objects(source, archive, commits)
+
+        writers = Writers(stream.ostree_archive_dir)
+
+        try:
+            with ThreadPoolExecutor(self.workers) as pool:
+                report.size = sum(pool.map(lambda name: self._copy_object(source, writers.get(), name), objects))
+            writers.commit()
+        except BaseException:
+            writers.abort()
+            raise
+
+        for hashsum in commits:
+            report.size += self._copy_object(source, target, (hashsum, OSTree.ObjectType.COMMIT))
+
+        report.commits = len(commits)
+        report.objects = len(objects) + len(commits)
+
+        if archive.storage.resolve_rev(str(stream), True)[1] != head:
+            target.transaction_set_ref(None, str(stream), head)
+            report.updated = True
+
+        return report
+
+    def replicate(self, streams: list[Stream], heads: dict[str, str] | None = None) -> list[ReplicationReport]:
+        """
+        Replicate the streams from the bare repositories to the archive ones
+
+        :param streams: streams to replicate
+        :type streams: list[Stream]
+        :param heads: commit to replicate for the stream (the latest if not set)
+        :type heads: dict[str, str] | None
+        :return: reports in the streams order
+        :rtype: list[ReplicationReport]
+        """
+        gi = gi_modules()
+        heads = heads or {}
+        reports: dict[str, ReplicationReport] = {}
+        groups: dict[str, list[Stream]] = {}
+
+        for stream in streams:
+            groups.setdefault(str(stream.ostree_archive_dir), []).append(stream)
+
+        for archive_dir, group in groups.items():
+            target = gi.OSTree.Repo.new(gi.Gio.file_new_for_path(archive_dir))
+            target.open(None)
+            target.prepare_transaction(None)
+
+            try:
+                for stream in group:
+                    reports[str(stream)] = self._replicate_stream(stream, target, heads.get(str(stream)))
+                target.commit_transaction(None)
+            except BaseException:
+                target.abort_transaction(None)
+                raise
+            finally:
+                REPOSITORY_POOL.invalidate(pathlib.Path(archive_dir))
+
+            if any(reports[str(stream)].updated for stream in group):
+                target.regenerate_summary(None, None)
+
+        return [reports[str(stream)] for stream in streams]
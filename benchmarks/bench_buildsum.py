@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import argparse
+import pathlib
+import tempfile
+import timeit
+import typing
+
+from altcosa.core.alt import Arch, Branch
+from altcosa.core.build import Format, Platform
+from altcosa.core.buildsum import Collector
+
+STREAMS = ("base", "k8s", "nginx", "podman")
+
+
+def make_storage(root: pathlib.Path, versions: int) -> None:
+    """
+    Make the builds storage with `versions` versions of every stream
+    """
+    for arch in Arch:
+        for stream in STREAMS:
+            for index in range(versions):
+                version = root.joinpath(arch, stream, f"20230101.{index // 100}.{index % 100}")
+                for platform, fmt in ((Platform.QEMU, Format.QCOW2), (Platform.METAL, Format.ISO)):
+                    directory = version.joinpath(platform, fmt)
+                    directory.mkdir(parents=True, exist_ok=True)
+                    for suffix in ("", ".sig", ".xz", ".xz.sig"):
+                        directory.joinpath(f"altcos.{fmt}{suffix}").touch()
+
+
+def collect_old(root: pathlib.Path) -> dict[str, typing.Any]:
+    """
+    Glob every level from the root (as `cmd-buildsum.py` did before the single walk)
+    """
+    result: dict[str, typing.Any] = {}
+
+    for arch in root.glob("*"):
+        for stream in root.glob(f"{arch.name}/*"):
+            for version in root.glob(f"{arch.name}/{stream.name}/*"):
+                for platform in root.glob(f"{arch.name}/{stream.name}/{version.name}/*"):
+                    for fmt in root.glob(f"{arch.name}/{stream.name}/{version.name}/{platform.name}/*"):
+                        path = f"{arch.name}/{stream.name}/{version.name}/{platform.name}/{fmt.name}"
+                        result[path] = [str(artifact) for artifact in root.glob(f"{path}/*")]
+
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare per-level globs with the single scandir walk")
+    parser.add_argument("--versions", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None)
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as storage:
+        make_storage(pathlib.Path(storage, Branch.SISYPHUS), args.versions)
+        versions = args.versions * len(STREAMS) * len(Arch)
+
+        for label, func in (
+            ("old", lambda: collect_old(pathlib.Path(storage, Branch.SISYPHUS))),
+            ("new", lambda: Collector(Branch.SISYPHUS, storage, args.workers).collect()),
+        ):
+            best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+            print(f"{label}: {best:.4f}s for {versions} versions ({best / versions * 1e6:.1f}us per version)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import argparse
+import dataclasses
+import os
+import subprocess
+import sys
+
+
+@dataclasses.dataclass
+class ImportCheck:
+    module: str
+    threshold: float  # cumulative import time limit (ms)
+    forbidden: tuple[str, ...] = ()  # modules that must not be imported
+
+
+CHECKS = [
+    # cmdlib.sh needs only Stream.export()
+    ImportCheck("altcosa.core.alt", 60, ("gi", "gi.repository.OSTree")),
+    # scripts registry must be discovered on the first use only
+    ImportCheck("altcosa.config.common", 80, ("gi",)),
+    ImportCheck("altcosa.config.v1.executor", 500, ("gi", "rpm")),
+]
+
+
+def measure(module: str) -> tuple[float, set[str]]:
+    """
+    Import the module at the fresh interpreter with `-X importtime`
+
+    :param module: module name
+    :type module: str
+    :return: cumulative import time of the module (ms) and all the imported modules
+    :rtype: tuple[float, set[str]]
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stderr=subprocess.PIPE,
+        text=True,
+        env={**os.environ, "PYTHONPATH": os.getcwd()},
+        check=True,
+    )
+
+    cumulative = 0.0
+    imported = set()
+
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+
+        _, cumulative_us, name = (part.strip() for part in line.removeprefix("import time:").split("|"))
+
+        if not cumulative_us.isdigit():
+            continue
+
+        imported.add(name)
+
+        if name == module:
+            cumulative = int(cumulative_us) / 1000
+
+    return cumulative, imported
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check the import time of altcosa modules")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="thresholds multiplier for slow hosts")
+
+    args = parser.parse_args()
+
+    failed = False
+
+    for check in CHECKS:
+        results = [measure(check.module) for _ in range(args.repeat)]
+        best = min(cumulative for cumulative, _ in results)
+        leaked = sorted(set(check.forbidden).intersection(results[0][1]))
+        threshold = check.threshold * args.scale
+
+        status = "ok"
+        if best > threshold or leaked:
+            status = "FAIL"
+            failed = True
+
+        print(f"{status:4} {check.module}: {best:.1f}ms (limit {threshold:.0f}ms)"
+              + (f", imports {leaked}" if leaked else ""))
+
+    sys.exit(int(failed))
+
+
+if __name__ == "__main__":
+    main()
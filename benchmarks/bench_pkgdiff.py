@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import random
+import timeit
+import typing
+
+import rpm  # type: ignore
+
+from altcosa.core.packages import PackageRow, PackageSet
+
+
+class HeaderPackage:
+    """
+    Package holding the whole rpm header (as `cmd-pkgdiff.py` did before PackageSet)
+    """
+    def __init__(self, header: typing.Any) -> None:
+        self._header = header
+
+    def __gt__(self, other: "HeaderPackage") -> bool:
+        return int(rpm.versionCompare(self._header, other._header)) == 1
+
+
+HeaderMapping: typing.TypeAlias = dict[str, HeaderPackage]
+
+
+def make_commits(packages: int, commits: int, changed: float) -> list[list[PackageRow]]:
+    """
+    Make the packages of `commits` commits, every commit updates, adds and removes
+    `changed` share of the packages of the previous one
+    """
+    rng = random.Random(0)
+    rows: list[PackageRow] = [
+        (f"package-{n}", None, f"{rng.randint(1, 9)}.{rng.randint(0, 99)}", "alt1", f"summary of package {n}")
+        for n in range(packages)
+    ]
+    result = [list(rows)]
+
+    for commit in range(1, commits):
+        for index in rng.sample(range(len(rows)), int(len(rows) * changed)):
+            name, epoch, version, release, summary = rows[index]
+            rows[index] = (name, epoch, version, f"alt{commit + 1}", summary)
+        del rows[:int(len(rows) * changed / 2)]
+        rows.extend((f"package-{commit}-{n}", None, "1.0", "alt1", "new package")
+                    for n in range(int(packages * changed / 2)))
+        result.append(list(rows))
+
+    return result
+
+
+def make_header(row: PackageRow) -> typing.Any:
+    header = rpm.hdr()
+    header[rpm.RPMTAG_NAME] = row[0]
+    header[rpm.RPMTAG_VERSION] = row[2]
+    header[rpm.RPMTAG_RELEASE] = row[3]
+    header[rpm.RPMTAG_SUMMARY] = row[4]
+    return header
+
+
+def diff_old(a: HeaderMapping, b: HeaderMapping) -> int:  # noqa: VNE001
+    updated = [name for name in a.keys() & b.keys() if a[name] > b[name]]
+    new = set(a.keys()).difference(set(b.keys()))
+    removed = set(b.keys()).difference(set(a.keys()))
+    return len(updated) + len(new) + len(removed)
+
+
+def diff_new(a: PackageSet, b: PackageSet) -> int:  # noqa: VNE001
+    return len(a.updated(b)) + len(a.unique(b)) + len(b.unique(a))
+
+
+def rss() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare header-backed package mappings with PackageSet")
+    parser.add_argument("--packages", type=int, default=1500)
+    parser.add_argument("--commits", type=int, default=50)
+    parser.add_argument("--changed", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=5)
+
+    args = parser.parse_args()
+
+    commits = make_commits(args.packages, args.commits, args.changed)
+
+    before = rss()
+    new_sets = [PackageSet(rows) for rows in commits]
+    new_rss = rss() - before
+
+    before = rss()
+    old_sets = [{row[0]: HeaderPackage(make_header(row)) for row in rows} for rows in commits]
+    old_rss = rss() - before
+
+    steps = len(commits) - 1
+
+    for label, sets, diff, memory in (
+        ("old", old_sets, diff_old, old_rss),
+        ("new", new_sets, diff_new, new_rss),
+    ):
+        best = min(timeit.repeat(
+            lambda: [diff(a, b) for a, b in zip(sets[1:], sets)],  # type: ignore
+            number=1,
+            repeat=args.repeat,
+        ))
+        print(f"{label}: {best:.4f}s for {steps} diffs ({best / steps * 1e3:.2f}ms per diff), "
+              f"{memory / 1024 ** 2:.1f} MiB for {len(commits)} commits")
+
+
+if __name__ == "__main__":
+    main()
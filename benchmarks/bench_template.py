@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import argparse
+import timeit
+
+import jinja2
+
+from altcosa.config.base import Config
+from altcosa.config.template import TemplateEngine
+
+
+def make_config(items: int, args: int) -> Config:
+    """
+    Make a config with `items` pipe items, each of them has `args` arguments,
+    half of the arguments are templates and half are literals
+    """
+    return Config.model_validate({
+        "version": 1,
+        "define": [{"name": "stream", "value": "altcos/{{ arch }}/{{ branch }}/base"}],
+        "pipe": [
+            {
+                "name": "apt.sh@1",
+                "args": {
+                    f"arg{n}": "{{ stream }}/{{ repodir }}" if n % 2 else f"literal-{n}"
+                    for n in range(args)
+                },
+            }
+            for _ in range(items)
+        ],
+    })
+
+
+def render_old(config: Config, context: dict[str, str]) -> None:
+    for item in config.pipe:
+        for value in item.args.values():
+            jinja2.Environment(loader=jinja2.BaseLoader()).from_string(value).render(**context)
+
+
+def render_new(config: Config, context: dict[str, str]) -> None:
+    engine = TemplateEngine()
+    for item in config.pipe:
+        for value in item.args.values():
+            engine.render(value, context)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare per-value jinja environments with the shared engine")
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--args", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+
+    args = parser.parse_args()
+
+    config = make_config(args.items, args.args)
+    context = {
+        "arch": "x86_64",
+        "branch": "sisyphus",
+        "repodir": "/srv/altcos",
+        "stream": "altcos/x86_64/sisyphus/base",
+    }
+    values = args.items * args.args
+
+    for label, func in (("old", render_old), ("new", render_new)):
+        best = min(timeit.repeat(lambda: func(config, context), number=1, repeat=args.repeat))
+        print(f"{label}: {best:.4f}s for {values} values ({best / values * 1e6:.1f}us per value)")
+
+
+if __name__ == "__main__":
+    main()
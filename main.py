@@ -2,11 +2,19 @@
 
 import argparse
 import json
+import pathlib
+import sys
 
 import yaml
 
+from altcosa.config.cache import StepCache
+from altcosa.config.common import CACHE_DIR
+from altcosa.config.output import LOGS_DIR, LogStore
+from altcosa.config.trace import TRACES_DIR, Tracer
 from altcosa.config.v1.executor import Executor, Config
+from altcosa.config.v1.matrix import Matrix
 from altcosa.config.utils import Storage
+from altcosa.core.cache import DiskCache
 
 
 def main() -> None:
@@ -16,21 +24,93 @@ def main() -> None:
         help="YAML formatted config file")
     parser.add_argument(
         "--preset-file",
-        help="JSON formatted file",
+        help="JSON formatted file, list of presets runs the config for each of them",
         default=None)
+    parser.add_argument(
+        "--matrix-workers",
+        help="number of presets that may run at once",
+        type=int,
+        default=2)
+    parser.add_argument(
+        "--workers",
+        help="number of pipe items that may run at once",
+        type=int,
+        default=1)
+    parser.add_argument(
+        "--step-cache-size",
+        help="step cache size limit in MiB",
+        type=int,
+        default=512)
+    parser.add_argument(
+        "--log-dir",
+        help="directory for the compressed step logs",
+        type=pathlib.Path,
+        default=LOGS_DIR)
+    parser.add_argument(
+        "--log-keep",
+        help="number of the most recent logs kept for each step",
+        type=int,
+        default=10)
+    parser.add_argument(
+        "--output-tail",
+        help="size of the step output tail kept in memory in KiB",
+        type=int,
+        default=1024)
+    parser.add_argument(
+        "--no-in-process",
+        help="run python scripts by the shell even if they declare the entrypoint",
+        dest="in_process",
+        action="store_false")
+    parser.add_argument(
+        "--trace-dir",
+        help="directory for the steps JSON summary and Chrome trace-event files",
+        type=pathlib.Path,
+        default=TRACES_DIR)
 
     args = parser.parse_args()
 
     with open(args.config) as file:
         content = yaml.safe_load(file)
 
+    preset: dict[str, str] | list[dict[str, str]] = {}
+
     if args.preset_file:
         with open(args.preset_file) as file:
-            Storage().pool.update(json.load(file))
+            preset = json.load(file)
+
+    step_cache = StepCache(DiskCache(CACHE_DIR.joinpath("steps"), args.step_cache_size * 1024 ** 2))
+
+    log_store = LogStore(args.log_dir, args.log_keep)
+
+    if isinstance(preset, list):
+        matrix = Matrix(
+            content,
+            preset,
+            args.matrix_workers,
+            log_store,
+            args.trace_dir,
+            workers=args.workers,
+            step_cache=step_cache,
+            output_tail=args.output_tail * 1024,
+            in_process=args.in_process,
+        )
+        results = matrix.run()
+        print(matrix.format_summary(results))
+        sys.exit(int(not all(result.succeeded for result in results)))
+
+    Storage().pool.update(preset)
 
     config = Config.model_validate(content)
 
-    Executor(config).execute()
+    Executor(
+        config,
+        args.workers,
+        step_cache,
+        log_store,
+        args.output_tail * 1024,
+        args.in_process,
+        Tracer(args.trace_dir),
+    ).execute()
 
 
 if __name__ == "__main__":
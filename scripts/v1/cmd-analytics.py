@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# altcosa: entrypoint=main
+
+import argparse
+import json
+import sys
+
+from loguru import logger
+
+import gi  # type: ignore # noqa: I100
+
+gi.require_version("OSTree", "1.0")
+
+from gi.repository import GLib, OSTree  # type: ignore # noqa: I202,E402
+
+from altcosa.core.alt import Repository, Stream  # noqa: E402
+from altcosa.core.analytics import Analyzer, format_table  # noqa: E402
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Report the storage used by the streams commits")
+
+    parser.add_argument("--stream", action="append", required=True,
+                        help="ALTCOS stream (e.g. `altcos/x86_64/p10/base`), may be repeated")
+    parser.add_argument("--repodir", required=True,
+                        help="ALTCOS repository directory")
+    parser.add_argument("--mode", choices=["bare", "archive"], default="bare",
+                        help="OSTree repository mode")
+    parser.add_argument("--depth", type=int, default=3,
+                        help="directory depth to group the changed files by")
+    parser.add_argument("--top", type=int, default=10,
+                        help="number of the most changed directories to show")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of the threads querying the objects sizes (default: number of CPUs)")
+    parser.add_argument("-j", "--json", action="store_true",
+                        help="print the report as JSON")
+    parser.add_argument("-c", "--check", action="store_true",
+                        help="check the passed arguments and exit (need for compability with config API)")
+
+    args = parser.parse_args(argv)
+
+    if args.check:
+        sys.exit(0)
+
+    try:
+        streams = [Stream.from_str(args.repodir, stream) for stream in args.stream]
+    except ValueError as e:
+        parser.error(str(e))
+
+    mode = OSTree.RepoMode.BARE if args.mode == "bare" else OSTree.RepoMode.ARCHIVE
+    analyzer = Analyzer(args.workers, churn_depth=args.depth)
+
+    try:
+        stats = [analyzer.analyze(Repository(stream, mode)) for stream in streams]
+    except GLib.Error as e:
+        logger.error(e)
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps([stream.to_dict() for stream in stats], indent=2))
+    else:
+        print(format_table(stats, args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -124,17 +124,9 @@ fi
 # shellcheck disable=SC2153
 COMMIT="$(get_commit "$STREAM" "$OPT_REPODIR" "$OPT_MODE")"
 
-VERSION="$(python3 "$__dir"/cmd-ver.py \
-    "$STREAM" \
-    "$OPT_REPODIR" \
-    -c "$COMMIT" \
-    --view native)"
-
-VERSION_PATH="$(python3 "$__dir"/cmd-ver.py \
-    "$STREAM" \
-    "$OPT_REPODIR" \
-    -c "$COMMIT" \
-    --view path)"
+export_version "$STREAM" "$OPT_REPODIR" "$COMMIT"
+
+VERSION="$VERSION_NATIVE"
 
 COMMIT_DIR="$VARS_DIR"/"$VERSION_PATH"/var
 
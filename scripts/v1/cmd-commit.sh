@@ -119,15 +119,12 @@ esac
 COMMIT="$(get_commit "$STREAM" "$OPT_REPODIR" "$OPT_MODE")"
 if [ -z "$COMMIT" ]; then
     COMMIT="$(get_commit "$OSNAME"/"$ARCH"/"$BRANCH"/base "$OPT_REPODIR" "$OPT_MODE")"
-    VERSION_GET_ARGS="$STREAM $OPT_REPODIR --view full --inc-part $OPT_NEXT"
+    export_version "$STREAM" "$OPT_REPODIR" "" "$OPT_NEXT"
 else
-    VERSION_GET_ARGS="$STREAM $OPT_REPODIR --view full --inc-part $OPT_NEXT --commit $COMMIT"
+    export_version "$STREAM" "$OPT_REPODIR" "$COMMIT" "$OPT_NEXT"
 fi
 
-# shellcheck disable=SC2086
-VERSION="$(python3 "$__dir"/cmd-ver.py $VERSION_GET_ARGS --view full)"
-# shellcheck disable=SC2086
-VERSION_PATH="$(python3 "$__dir"/cmd-ver.py $VERSION_GET_ARGS --view path)"
+VERSION="$VERSION_FULL"
 
 VAR_DIR="$VARS_DIR"/"$VERSION_PATH"
 
@@ -182,6 +179,8 @@ rm -rf "$COMMIT"
 
 ostree summary --repo="$OSTREE_DIR" --update
 
+update_history "$STREAM" "$OPT_REPODIR" "$OPT_MODE"
+
 rm -rf "$WORK_DIR"
 
 echo "$NEW_COMMIT"
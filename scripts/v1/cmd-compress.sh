@@ -111,11 +111,9 @@ case "$OPT_COMMIT" in
         ;;
 esac
 
-VERSION="$(python3 "$__dir"/cmd-ver.py \
-    "$OPT_STREAM" \
-    "$OPT_REPODIR" \
-    -c "$OPT_COMMIT" \
-    --view native)"
+export_version "$OPT_STREAM" "$OPT_REPODIR" "$OPT_COMMIT"
+
+VERSION="$VERSION_NATIVE"
 
 ARTIFACT_DIR="$OPT_IMAGEDIR"/"$BRANCH"/"$ARCH"/"$NAME"/"$VERSION"/"$OPT_PLATFORM"/"$OPT_FORMAT"
 
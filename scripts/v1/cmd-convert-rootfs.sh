@@ -231,17 +231,9 @@ chroot "$ROOT_TMPDIR" dracut \
 rm -rf "$ROOT_TMPDIR"/usr/etc
 mv "$ROOT_TMPDIR"/etc "$ROOT_TMPDIR"/usr/etc
 
-VERSION="$(python3 "$__dir"/cmd-ver.py \
-    "$STREAM" \
-    "$OPT_REPODIR" \
-    --inc-part date \
-    --view full)"
-
-VERSION_PATH="$(python3 "$__dir"/cmd-ver.py \
-    "$STREAM" \
-    "$OPT_REPODIR" \
-    --inc-part date \
-    --view path)"
+export_version "$STREAM" "$OPT_REPODIR" "" date
+
+VERSION="$VERSION_FULL"
 
 mkdir -p "$VARS_DIR"/"$VERSION_PATH"
 rsync -av "$ROOT_TMPDIR"/var "$VARS_DIR"/"$VERSION_PATH"
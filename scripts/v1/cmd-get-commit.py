@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+# altcosa: entrypoint=main
 
 import argparse
 import dataclasses
@@ -66,7 +67,7 @@ class CliOptions:
         print(last_commit)
 
 
-def main() -> None:
+def main(argv: list[str] | None = None) -> None:
     parser = argparse.ArgumentParser()
 
     parser.add_argument("stream",
@@ -75,7 +76,7 @@ def main() -> None:
                         help="ALTCOS repository directory")
     parser.add_argument("mode", choices=[*Mode])
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     CliOptions.from_args(args).handle()
 
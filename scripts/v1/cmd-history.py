@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# altcosa: entrypoint=main
+
+import argparse
+import dataclasses
+import enum
+import json
+import sys
+import typing
+
+from loguru import logger
+
+import gi  # type: ignore # noqa: I100
+
+gi.require_version("OSTree", "1.0")
+
+from gi.repository import GLib, OSTree  # type: ignore # noqa: I202,E402
+
+from altcosa.core.alt import Repository, Stream  # noqa: E402
+from altcosa.core.history import History, HistoryEntry  # noqa: E402
+
+
+class Mode(enum.StrEnum):
+    BARE = "bare"
+    ARCHIVE = "archive"
+
+
+@dataclasses.dataclass
+class CliOptions:
+    stream: str
+    repodir: str
+    mode: Mode = Mode.BARE
+    update: bool = False
+    commit: str | None = None
+    version: str | None = None
+    date: str | None = None
+    as_json: bool = False
+
+    def __post_init__(self) -> None:
+        self.mode = Mode(self.mode)
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> typing.Self:
+        """
+        Create a new CliOptions instance from argparse arguments
+        args must contain the following fields:
+            - stream
+            - repodir
+            - mode
+            - update
+            - commit (optional)
+            - version (optional)
+            - date (optional)
+            - as_json
+
+        :param args: arguments from the cli
+        :type args: argparse.Namespace
+        :return: instance of CliOptions
+        :rtype: typing.Self
+        """
+        return cls(
+            args.stream, args.repodir, args.mode, args.update, args.commit, args.version, args.date, args.as_json,
+        )
+
+    def handle(self) -> None:
+        stream = Stream.from_str(self.repodir, self.stream)
+
+        if self.update:
+            mode = OSTree.RepoMode.BARE if self.mode == Mode.BARE else OSTree.RepoMode.ARCHIVE
+
+            try:
+                count = History.for_stream(stream).update(Repository(stream, mode))
+            except GLib.Error as e:
+                logger.error(e)
+                sys.exit(1)
+
+            logger.info(f"{count} commits are indexed")
+            return
+
+        self.print_entries(self._lookup(History.for_stream(stream), str(stream)))
+
+    def _lookup(self, history: History, ref: str) -> list[HistoryEntry]:
+        if self.commit:
+            entries = [entry] if (entry := history.get(self.commit, ref, self.mode)) else []
+        elif self.version:
+            entries = [entry for entry in history.find(self.version, self.mode) if entry.ref == ref]
+        elif self.date:
+            entries = [entry] if (entry := history.newest(ref, self.date, self.mode)) else []
+        else:
+            entries = history.versions(ref, self.mode)
+
+        if not entries:
+            logger.error("No one commit found")
+            sys.exit(1)
+
+        return entries
+
+    def print_entries(self, entries: list[HistoryEntry]) -> None:
+        if self.as_json:
+            print(json.dumps([dataclasses.asdict(entry) for entry in entries], indent=2))
+            return
+
+        for entry in entries:
+            print(f"{entry.hashsum} {entry.version or '-'} {entry.timestamp}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Update and query the commits history index of the stream")
+
+    parser.add_argument("--stream", required=True,
+                        help="ALTCOS stream (e.g. `altcos/x86_64/p10/base`)")
+    parser.add_argument("--repodir", required=True,
+                        help="ALTCOS repository directory")
+    parser.add_argument("--mode", choices=[*Mode], default=Mode.BARE,
+                        help="repository to index or look up")
+    parser.add_argument("-u", "--update", action="store_true",
+                        help="index the commits the refs got since the last update")
+    parser.add_argument("--commit",
+                        help="get the commit by hashsum")
+    parser.add_argument("--version",
+                        help="get the commits by native or full version")
+    parser.add_argument("--date",
+                        help="get the newest commit at or before the date (e.g. 20230201)")
+    parser.add_argument("-j", "--json", dest="as_json", action="store_true",
+                        help="print JSON")
+    parser.add_argument("-c", "--check", action="store_true",
+                        help="check the passed arguments and exit (need for compability with config API)")
+
+    args = parser.parse_args(argv)
+
+    if args.check:
+        sys.exit(0)
+
+    CliOptions.from_args(args).handle()
+
+
+if __name__ == "__main__":
+    main()
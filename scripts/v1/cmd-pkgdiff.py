@@ -1,15 +1,11 @@
 #!/usr/bin/env python3
 # mypy: ignore-errors
+# altcosa: entrypoint=main
 
 import argparse
 import dataclasses
 import json
-import pathlib
-import shlex
-import subprocess
 import sys
-import tempfile
-from typing import Self, TypeAlias, no_type_check
 
 import gi
 
@@ -19,146 +15,157 @@ from gi.repository import OSTree  # noqa: I202,E402
 
 from loguru import logger  # noqa: E402
 
-import rpm  # noqa: E402
-
 from altcosa.core.alt import Commit, Repository, Stream  # noqa: E402
-
-
-PROGRAM_NAME = pathlib.Path(sys.argv[0]).name
+from altcosa.core.packages import Package, PackageSet, PackagesCache  # noqa: E402
 
 
 @dataclasses.dataclass
-class Package:
-    _header: rpm.hdr
-
-    @no_type_check
-    def __eq__(self, other: object) -> bool:
-        return rpm.versionCompare(self._header, other._header) == 0
-
-    @no_type_check
-    def __lt__(self, other: object) -> bool:
-        return rpm.versionCompare(self._header, other._header) == -1
-
-    @no_type_check
-    def __gt__(self, other: object) -> bool:
-        return rpm.versionCompare(self._header, other._header) == 1
-
-    @property
-    @no_type_check
-    def name(self) -> str:
-        return self._header[rpm.RPMTAG_NAME].decode()
-
-    @property
-    @no_type_check
-    def version(self) -> str:
-        return self._header[rpm.RPMTAG_VERSION].decode()
-
-    @property
-    @no_type_check
-    def release(self) -> str:
-        return self._header[rpm.RPMTAG_RELEASE].decode()
-
-    @property
-    @no_type_check
-    def epoch(self) -> int:
-        return self._header[rpm.RPMTAG_EPOCH]
-
-    @property
-    @no_type_check
-    def summary(self) -> str:
-        return self._header[rpm.RPMTAG_SUMMARY].decode()
-
-    def to_dict(self) -> dict:
+class UpdateDiff:
+    new_pkg: Package
+    old_pkg: Package
+
+    def to_dict(self) -> dict[str, dict]:
         return {
-            "name": self.name,
-            "version": self.version,
-            "release": self.release,
-            "epoch": self.epoch,
-            "summary": self.summary,
+            "new": self.new_pkg.to_dict(),
+            "old": self.old_pkg.to_dict(),
         }
 
 
-PackageMapping: TypeAlias = dict[str, Package]
+def get_update_diff_list(a: PackageSet, b: PackageSet) -> list[UpdateDiff]:  # noqa: VNE001
+    return [UpdateDiff(new_pkg, old_pkg) for new_pkg, old_pkg in a.updated(b)]
+
+
+def get_unique_pkgs(a: PackageSet, b: PackageSet) -> list[Package]:  # noqa: VNE001
+    return a.unique(b)
+
+
+def make_metadata(
+    stream: Stream,
+    commit: Commit,
+    pkgs: PackageSet,
+    parent_commit: Commit | None,
+    parent_pkgs: PackageSet | None,
+) -> dict:
+    [installed, updated, new, removed] = [[]] * 4
+
+    installed = [pkg.to_dict() for pkg in pkgs]
+
+    if parent_pkgs is not None:
+        new = [pkg.to_dict() for pkg in get_unique_pkgs(pkgs, parent_pkgs)]
+        removed = [pkg.to_dict() for pkg in get_unique_pkgs(parent_pkgs, pkgs)]
+        updated = [diff.to_dict() for diff in get_update_diff_list(pkgs, parent_pkgs)]
+
+    return {
+        "reference": str(stream),
+        "version": str(commit.version),
+        "description": str(commit.description),
+        "commit": str(commit),
+        "parent": str(parent_commit) if parent_commit else None,
+        "package_info": {
+            "installed": installed,
+            "new": new,
+            "removed": removed,
+            "updated": updated,
+        },
+    }
+
+
+def write_metadata(stream: Stream, commit: Commit, metadata: dict) -> None:
+    metadata_path = stream.vars_dir.joinpath(
+        commit.version.like_path(), "metadata.json")
+    with open(metadata_path, "w") as file:
+        json.dump(metadata, file)
 
 
-class BDBReader:
+def get_range(commit: Commit, from_commit: str | None) -> list[Commit]:
     """
-    Berkeley DB reader for OSTree repository
+    Get the commits from the `from_commit` (whole history if not set) up to the commit
+
+    :return: commits from the oldest
+    :rtype: list[Commit]
     """
-    def __init__(self, content: bytes) -> None:
-        """
-        :param content: content of /lib/rpm/Packages
-        :type content: bytes
-        """
-        self.content = content
+    commits = []
 
-    @classmethod
-    def from_commit(cls, commit: Commit) -> Self:
-        """
-        Get the Packages DB from the given commit
+    for ancestor in commit.ancestors():
+        commits.append(ancestor)
+        if ancestor.hashsum == from_commit:
+            break
+    else:
+        if from_commit is not None:
+            raise ValueError(f"commit \"{from_commit}\" is not an ancestor of \"{commit}\"")
 
-        :param commit: commit hashsum
-        :type commit: Commit
-        :return: BDBReader instance
-        :rtype: Self
-        """
+    return commits[::-1]
 
-        # read the /lib/rpm/Packages raw content
-        cmd = shlex.split(
-            f"ostree cat {commit} --repo={commit.repository.path} /lib/rpm/Packages",
-        )
 
-        content = subprocess.run(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-        ).stdout
+def range_metadata(stream: Stream, commits: list[Commit], cache: PackagesCache, args: argparse.Namespace) -> list[dict]:
+    """
+    Diff every commit of the range with its parent, the oldest commit is only
+    a base unless it's the first commit of the history
+    """
+    packages = cache.read_many(commits, args.jobs, args.rebuild_cache)
+    metadata = []
 
-        return cls(content)
+    if commits and (commits[0].parent is None or not commits[0].parent.exists()):
+        metadata.append(make_metadata(stream, commits[0], packages[commits[0].hashsum], None, None))
 
-    def translate(self) -> PackageMapping:
-        """
-        Translate raw package information to the dataclass
+    for parent_commit, commit in zip(commits, commits[1:]):
+        metadata.append(make_metadata(
+            stream, commit, packages[commit.hashsum], parent_commit, packages[parent_commit.hashsum],
+        ))
 
-        :return: mapped Package instance by own name
-        :rtype: PackageMapping
-        """
+    return metadata
 
-        with tempfile.TemporaryDirectory(prefix=PROGRAM_NAME) as dbpath:
-            db = pathlib.Path(dbpath, "Packages")
-            db.write_bytes(self.content)
 
-            if dbpath:
-                rpm.addMacro("_dbpath", dbpath)
+def get_commit(repo: Repository, hashsum: str) -> Commit:
+    if hashsum == "latest":
+        if not (commit := repo.last_commit()):
+            logger.error("no one commit found")
+            sys.exit(1)
+    else:
+        if not (commit := Commit(repo, hashsum)).exists():
+            logger.error(f"commit \"{commit}\" not found")
+            sys.exit(1)
 
-            pkgs = {hdr[rpm.RPMTAG_NAME]: Package(hdr) for hdr in rpm.TransactionSet().dbMatch()}
+    return commit
 
-            if dbpath:
-                rpm.delMacro("_dbpath")
 
-        return pkgs
+def diff_commit(stream: Stream, commit: Commit, args: argparse.Namespace) -> None:
+    cache = PackagesCache()
+    pkgs = cache.read(commit, args.rebuild_cache)
+    parent_pkgs = None
 
+    # the parent may be removed by the pruner, the commit is diffed as the first one then
+    if (parent_commit := commit.parent) is not None and not parent_commit.exists():
+        parent_commit = None
 
-@dataclasses.dataclass
-class UpdateDiff:
-    new_pkg: Package
-    old_pkg: Package
+    if parent_commit is not None:
+        parent_pkgs = cache.read(parent_commit, args.rebuild_cache)
 
-    def to_dict(self) -> dict[str, PackageMapping]:
-        return {
-            "new": self.new_pkg.to_dict(),
-            "old": self.old_pkg.to_dict(),
-        }
+    metadata = make_metadata(stream, commit, pkgs, parent_commit, parent_pkgs)
+
+    if args.write:
+        write_metadata(stream, commit, metadata)
+    else:
+        print(json.dumps(metadata))
 
 
-def get_update_diff_list(a: PackageMapping, b: PackageMapping) -> list[UpdateDiff]:  # noqa: VNE001
-    return [UpdateDiff(a[name], b[name]) for name in a.keys() & b.keys() if a[name] > b[name]]
+def diff_range(stream: Stream, commit: Commit, args: argparse.Namespace) -> None:
+    try:
+        commits = get_range(commit, args.from_commit)
+    except ValueError as e:
+        logger.error(e)
+        sys.exit(1)
 
+    metadata_list = range_metadata(stream, commits, PackagesCache(), args)
 
-def get_unique_pkgs(a: PackageMapping, b: PackageMapping) -> PackageMapping:  # noqa: VNE001
-    unique_names = set(a.keys()).difference(set(b.keys()))
-    return {name: a[name] for name in unique_names}
+    if args.write:
+        for metadata in metadata_list:
+            write_metadata(stream, Commit(commit.repository, metadata["commit"]), metadata)
+    else:
+        print(json.dumps(metadata_list))
 
 
-def main() -> None:
+def main(argv: list[str] | None = None) -> None:
     parser = argparse.ArgumentParser(description="Collect stream's metadata")
     parser.add_argument(
         "--stream",
@@ -171,9 +178,27 @@ def main() -> None:
         required=True,
     )
     parser.add_argument(
-        "--commit",
+        "--commit", "--to",
         help="commit hashsum (default: latest)",
         default="latest",
+        dest="commit",
+    )
+    parser.add_argument(
+        "--from",
+        help="diff every commit after this one up to the --commit (range mode)",
+        default=None,
+        dest="from_commit",
+    )
+    parser.add_argument(
+        "--all",
+        help="diff every commit of the history up to the --commit (range mode)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        help="number of the processes parsing the RPM databases at range mode (default: number of CPUs)",
+        type=int,
+        default=None,
     )
     parser.add_argument(
         "--mode",
@@ -183,7 +208,12 @@ def main() -> None:
     )
     parser.add_argument(
         "-w", "--write",
-        help="write info to the <streamdir>/metadata.json",
+        help="write info to the <streamdir>/metadata.json (of every version at range mode)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--rebuild-cache",
+        help="parse the RPM databases again and replace the cached packages",
         action="store_true",
     )
     parser.add_argument(
@@ -192,7 +222,7 @@ def main() -> None:
         action="store_true"
     )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     if args.check:
         sys.exit(0)
@@ -201,47 +231,12 @@ def main() -> None:
     mode = OSTree.RepoMode.BARE if args.mode == "bare" else OSTree.RepoMode.ARCHIVE
     repo = Repository(stream, mode)
 
-    if args.commit == "latest":
-        if not (commit := repo.last_commit()):
-            logger.error("no one commit found")
-            sys.exit(1)
-    else:
-        if not (commit := Commit(repo, args.commit)).exists():
-            logger.error(f"commit \"{commit}\" not found")
-            sys.exit(1)
-
-    pkgs = BDBReader.from_commit(commit).translate()
-    [installed, updated, new, removed] = [[]] * 4
-
-    installed = [pkg.to_dict() for pkg in pkgs.values()]
+    commit = get_commit(repo, args.commit)
 
-    if (parent_commit := commit.parent) is not None:
-        parent_pkgs = BDBReader.from_commit(parent_commit).translate()
-        new = [pkg.to_dict() for pkg in get_unique_pkgs(pkgs, parent_pkgs).values()]
-        removed = [pkg.to_dict() for pkg in get_unique_pkgs(parent_pkgs, pkgs).values()]
-        updated = [diff.to_dict() for diff in get_update_diff_list(pkgs, parent_pkgs)]
-
-    metadata = {
-        "reference": str(stream),
-        "version": str(commit.version),
-        "description": str(commit.description),
-        "commit": str(commit),
-        "parent": str(parent_commit) if parent_commit else None,
-        "package_info": {
-            "installed": installed,
-            "new": new,
-            "removed": removed,
-            "updated": updated,
-        },
-    }
-
-    if args.write:
-        metadata_path = stream.vars_dir.joinpath(
-            commit.version.like_path(), "metadata.json")
-        with open(metadata_path, "w") as file:
-            json.dump(metadata, file)
+    if args.from_commit is not None or args.all:
+        diff_range(stream, commit, args)
     else:
-        print(json.dumps(metadata))
+        diff_commit(stream, commit, args)
 
 
 if __name__ == "__main__":
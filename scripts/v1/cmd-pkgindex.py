@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# altcosa: entrypoint=main
+
+import argparse
+import dataclasses
+import enum
+import json
+import sys
+
+from loguru import logger
+
+import gi  # type: ignore # noqa: I100
+
+gi.require_version("OSTree", "1.0")
+
+from gi.repository import GLib, OSTree  # type: ignore # noqa: I202,E402
+
+from altcosa.core.alt import Repository, Stream  # noqa: E402
+from altcosa.core.pkgindex import PackageEntry, PackageIndex  # noqa: E402
+
+
+class Mode(enum.StrEnum):
+    BARE = "bare"
+    ARCHIVE = "archive"
+
+
+def update(index: PackageIndex, args: argparse.Namespace) -> None:
+    mode = OSTree.RepoMode.BARE if args.mode == Mode.BARE else OSTree.RepoMode.ARCHIVE
+
+    for stream in args.stream or []:
+        try:
+            count = index.update(Repository(Stream.from_str(args.repodir, stream), mode), workers=args.workers)
+        except (GLib.Error, ValueError) as e:
+            logger.error(e)
+            sys.exit(1)
+
+        logger.info(f"{stream}: {count} commits are indexed")
+
+
+def lookup(index: PackageIndex, args: argparse.Namespace) -> list[PackageEntry]:
+    streams = args.stream or [None]
+
+    if args.first:
+        return [entry for stream in streams for entry in index.first(args.package, stream).values()]
+
+    if args.below:
+        return [entry for stream in streams for entry in index.below(args.package, args.below, stream)]
+
+    return [entry for stream in streams for entry in index.find(args.package, stream)]
+
+
+def print_entries(entries: list[PackageEntry], as_json: bool) -> None:
+    if as_json:
+        print(json.dumps([dataclasses.asdict(entry) | {"evr": entry.evr} for entry in entries], indent=2))
+        return
+
+    for entry in entries:
+        print(f"{entry.stream} {entry.version or entry.commit} {entry.name} {entry.evr}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Update and query the packages index of the streams")
+
+    parser.add_argument("--repodir", required=True,
+                        help="ALTCOS repository directory (the index is <repodir>/packages.sqlite)")
+    parser.add_argument("--stream", action="append",
+                        help="ALTCOS stream (e.g. `altcos/x86_64/p10/base`), may be repeated (all if not set)")
+    parser.add_argument("--mode", choices=[*Mode], default=Mode.BARE,
+                        help="repository to index by --update")
+    parser.add_argument("-u", "--update", action="store_true",
+                        help="index the commits the streams got since the last update")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of the processes parsing the RPM databases (default: number of CPUs)")
+    parser.add_argument("--package",
+                        help="get the versions shipping the package")
+    parser.add_argument("--below",
+                        help="only the versions shipping the package older than the EVR (e.g. 3.0.8, 1:3.0.8-alt1)")
+    parser.add_argument("--first", action="store_true",
+                        help="only the first version of every stream shipping the package")
+    parser.add_argument("--export",
+                        help="write the whole index as JSON to the file (`-` for stdout)")
+    parser.add_argument("-j", "--json", dest="as_json", action="store_true",
+                        help="print JSON")
+    parser.add_argument("-c", "--check", action="store_true",
+                        help="check the passed arguments and exit (need for compability with config API)")
+
+    args = parser.parse_args(argv)
+
+    if args.update and not args.stream:
+        parser.error("--update requires --stream")
+
+    if args.check:
+        sys.exit(0)
+
+    index = PackageIndex.for_repodir(args.repodir)
+
+    if args.update:
+        update(index, args)
+
+    if args.export == "-":
+        print(json.dumps(index.export()))
+    elif args.export:
+        with open(args.export, "w") as export_file:
+            json.dump(index.export(), export_file)
+
+    if args.package:
+        print_entries(lookup(index, args), args.as_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# altcosa: entrypoint=main
+
+import argparse
+import pathlib
+import sys
+
+from loguru import logger
+
+import gi  # type: ignore # noqa: I100
+
+gi.require_version("OSTree", "1.0")
+
+from gi.repository import GLib  # type: ignore # noqa: I202,E402
+
+from altcosa.core.alt import Stream  # noqa: E402
+from altcosa.core.prune import PruneReport, Pruner, RetentionPolicy, buildsum_versions  # noqa: E402
+
+
+def print_reports(reports: list[PruneReport]) -> None:
+    action = "reclaimable" if any(report.dry_run for report in reports) else "pruned"
+
+    for report in reports:
+        print(f"{report.repository}: commits {len(report.commits)}, "
+              f"objects {report.objects} ({report.size} bytes), "
+              f"vars {report.vars_dirs} ({report.vars_size} bytes)")
+
+    total = sum(report.size + report.vars_size for report in reports)
+    print(f"total {action}: {total} bytes")
+
+
+def make_policies(args: argparse.Namespace, streams: list[Stream]) -> dict[str, RetentionPolicy]:
+    """
+    Make the retention policies of the streams, versions of the builds summary are kept unless --no-storage,
+    exit if the summary can't be read
+    """
+    try:
+        return {
+            str(stream): RetentionPolicy(
+                args.keep_last,
+                args.keep_days,
+                buildsum_versions(args.storage.joinpath(f"{stream.branch}.json"), stream) if args.storage else set(),
+            )
+            for stream in streams
+        }
+    except (OSError, ValueError) as e:
+        logger.error(f"failed to read the builds summary: {e}")
+        sys.exit(1)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Prune the streams repositories and vars by the retention policy")
+
+    parser.add_argument("--stream", action="append", required=True,
+                        help="ALTCOS stream (e.g. `altcos/x86_64/p10/base`), may be repeated")
+    parser.add_argument("--repodir", required=True,
+                        help="ALTCOS repository directory")
+    parser.add_argument("--keep-last", type=int, default=None,
+                        help="keep the number of the last commits")
+    parser.add_argument("--keep-days", type=float, default=None,
+                        help="keep the commits newer than the number of days")
+    published = parser.add_mutually_exclusive_group(required=True)
+    published.add_argument("--storage", type=pathlib.Path, default=None,
+                           help="builds storage directory, versions of its summary (<branch>.json) are kept")
+    published.add_argument("--no-storage", action="store_true",
+                           help="don't keep the versions of the published builds")
+    parser.add_argument("-n", "--dry-run", action="store_true",
+                        help="only report what would be removed")
+    parser.add_argument("-c", "--check", action="store_true",
+                        help="check the passed arguments and exit (need for compability with config API)")
+
+    args = parser.parse_args(argv)
+
+    if args.check:
+        sys.exit(0)
+
+    if args.keep_last is None and args.keep_days is None:
+        parser.error("--keep-last or --keep-days is required")
+
+    try:
+        streams = [Stream.from_str(args.repodir, stream) for stream in args.stream]
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        reports = Pruner(make_policies(args, streams), args.dry_run).prune(streams)
+    except GLib.Error as e:
+        logger.error(e)
+        sys.exit(1)
+
+    print_reports(reports)
+
+
+if __name__ == "__main__":
+    main()
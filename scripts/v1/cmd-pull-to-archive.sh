@@ -83,19 +83,11 @@ fi
 
 export_stream "$OPT_STREAM" "$OPT_REPODIR"
 
-case "$OPT_COMMIT" in
-    latest)
-        # shellcheck disable=SC2153
-        OPT_COMMIT="$(get_commit "$STREAM" "$OPT_REPODIR" "bare")"
-        ;;
-esac
-
-# shellcheck disable=SC2153
-ostree pull-local \
-    --depth=-1 \
-    "$OSTREE_BARE_DIR" \
-    "$STREAM" \
-    "$OPT_COMMIT" \
-    --repo="$OSTREE_ARCHIVE_DIR"
-
-ostree summary --repo="$OSTREE_ARCHIVE_DIR" --update
+ARGS=(--stream "$STREAM" --repodir "$OPT_REPODIR")
+[ "$OPT_COMMIT" = latest ] || ARGS+=(--commit "$OPT_COMMIT")
+
+# only the commits and objects the archive repository doesn't have are written,
+# summary is updated by the replication itself
+python3 "$__dir"/cmd-replicate.py "${ARGS[@]}"
+
+update_history "$STREAM" "$OPT_REPODIR" archive
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# altcosa: entrypoint=main
+
+import argparse
+import sys
+
+from loguru import logger
+
+import gi  # type: ignore # noqa: I100
+
+gi.require_version("OSTree", "1.0")
+
+from gi.repository import GLib  # type: ignore # noqa: I202,E402
+
+from altcosa.core.alt import Stream  # noqa: E402
+from altcosa.core.replicate import ReplicationReport, Replicator  # noqa: E402
+
+
+def print_reports(reports: list[ReplicationReport]) -> None:
+    for report in reports:
+        print(f"{report.stream}: {report.commit or '-'} "
+              f"commits {report.commits}, objects {report.objects}, bytes {report.size}")
+
+    print(f"total: commits {sum(report.commits for report in reports)}, "
+          f"objects {sum(report.objects for report in reports)}, "
+          f"bytes {sum(report.size for report in reports)}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Replicate the streams from the bare repositories to the archive ones")
+
+    parser.add_argument("--stream", action="append", required=True,
+                        help="ALTCOS stream (e.g. `altcos/x86_64/p10/base`), may be repeated")
+    parser.add_argument("--repodir", required=True,
+                        help="ALTCOS repository directory")
+    parser.add_argument("--commit",
+                        help="commit hashsum to replicate (default latest), single stream only")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of the object writing threads (default CPU count)")
+    parser.add_argument("-c", "--check", action="store_true",
+                        help="check the passed arguments and exit (need for compability with config API)")
+
+    args = parser.parse_args(argv)
+
+    if args.check:
+        sys.exit(0)
+
+    if args.commit and len(args.stream) > 1:
+        parser.error("--commit may be used with the single stream only")
+
+    try:
+        streams = [Stream.from_str(args.repodir, stream) for stream in args.stream]
+    except ValueError as e:
+        parser.error(str(e))
+
+    heads = {str(streams[0]): args.commit} if args.commit else None
+
+    try:
+        reports = Replicator(args.workers).replicate(streams, heads)
+    except GLib.Error as e:
+        logger.error(e)
+        sys.exit(1)
+
+    print_reports(reports)
+
+
+if __name__ == "__main__":
+    main()
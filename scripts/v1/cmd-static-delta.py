@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# altcosa: entrypoint=main
+
+import argparse
+import sys
+
+from loguru import logger
+
+import gi  # type: ignore # noqa: I100
+
+gi.require_version("OSTree", "1.0")
+
+from gi.repository import GLib  # type: ignore # noqa: I202,E402
+
+from altcosa.core.alt import Stream  # noqa: E402
+from altcosa.core.delta import DeltaGenerator, DeltaReport  # noqa: E402
+
+
+def print_reports(reports: list[DeltaReport]) -> None:
+    for report in reports:
+        line = f"{report.stream}: {report.from_commit[:12]}-{report.to_commit[:12]}"
+
+        if not report.generated:
+            print(f"{line} exists    delta {report.size}")
+            continue
+
+        ratio = report.size / report.objects_size * 100 if report.objects_size else 0.0
+        print(f"{line} generated delta {report.size}, new objects {report.objects_size} ({ratio:.1f}%), "
+              f"all objects {report.full_size}")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Generate static deltas for the last commits of the archive streams")
+
+    parser.add_argument("--stream", action="append", required=True,
+                        help="ALTCOS stream (e.g. `altcos/x86_64/p10/base`), may be repeated")
+    parser.add_argument("--repodir", required=True,
+                        help="ALTCOS repository directory")
+    parser.add_argument("--depth", type=int, default=5,
+                        help="number of the last commits of every stream to make the deltas for")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of the deltas generated at once (default CPU count)")
+    parser.add_argument("-c", "--check", action="store_true",
+                        help="check the passed arguments and exit (need for compability with config API)")
+
+    args = parser.parse_args(argv)
+
+    if args.check:
+        sys.exit(0)
+
+    try:
+        streams = [Stream.from_str(args.repodir, stream) for stream in args.stream]
+    except ValueError as e:
+        parser.error(str(e))
+
+    try:
+        reports = DeltaGenerator(args.workers).generate(streams, args.depth)
+    except GLib.Error as e:
+        logger.error(e)
+        sys.exit(1)
+
+    print_reports(reports)
+
+
+if __name__ == "__main__":
+    main()
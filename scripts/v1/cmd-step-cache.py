@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import argparse
+import datetime
+import sys
+
+from altcosa.config.cache import StepCache
+from altcosa.core.cache import CacheEntry
+
+
+def print_entries(entries: list[CacheEntry]) -> None:
+    for entry in entries:
+        used_at = datetime.datetime.fromtimestamp(entry.used_at).isoformat(sep=" ", timespec="seconds")
+        print(f"{entry.key}  {entry.size:>12}  {used_at}")
+
+    print(f"total: {len(entries)} entries, {sum(entry.size for entry in entries)} bytes")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect and purge the pipe step cache")
+    parser.add_argument(
+        "-l", "--list",
+        help="list the cache entries from the least to the most recently used",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--max-size",
+        help="evict the least recently used entries until the cache fits the size (MiB)",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--purge",
+        help="remove all the cache entries",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-c", "--check",
+        help="check the passed arguments and exit (need for compability with config API)",
+        action="store_true",
+    )
+
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0)
+
+    storage = StepCache().storage
+
+    if args.purge:
+        print_entries(storage.purge())
+    elif args.max_size is not None:
+        print_entries(storage.evict(args.max_size * 1024 ** 2))
+    else:
+        print_entries(storage.entries())
+
+
+if __name__ == "__main__":
+    main()
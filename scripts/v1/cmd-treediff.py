@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# altcosa: entrypoint=main
+
+import argparse
+import dataclasses
+import json
+import sys
+import typing
+
+from loguru import logger
+
+import gi  # type: ignore # noqa: I100
+
+gi.require_version("OSTree", "1.0")
+
+from gi.repository import OSTree  # type: ignore # noqa: I202,E402
+
+from altcosa.core.alt import Commit, DiffKind, Repository, Stream  # noqa: E402
+
+
+def get_commit(repo: Repository, hashsum: str) -> Commit:
+    if hashsum == "latest":
+        if not (commit := repo.last_commit()):
+            logger.error("no one commit found")
+            sys.exit(1)
+    elif not (commit := Commit(repo, hashsum)).exists():
+        logger.error(f"commit \"{hashsum}\" not found")
+        sys.exit(1)
+
+    return commit
+
+
+def write_diff(commit: Commit, base: Commit, output: typing.TextIO) -> dict[str, int]:
+    """
+    Write the diff JSON entry by entry, so the whole diff is never kept in memory
+
+    :return: number of the changed paths by kind
+    :rtype: dict[str, int]
+    """
+    counts: dict[str, int] = {kind: 0 for kind in DiffKind}
+
+    output.write(f"{{\"commit\": {json.dumps(str(commit))}, \"base\": {json.dumps(str(base))}, \"entries\": [")
+
+    for number, entry in enumerate(commit.diff(base)):
+        counts[entry.kind] += 1
+        output.write(("," if number else "") + "\n" + json.dumps(dataclasses.asdict(entry)))
+
+    output.write("\n], \"summary\": " + json.dumps(counts) + "}\n")
+
+    return counts
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Get the paths changed by the commit")
+    parser.add_argument(
+        "--stream",
+        help="stream name (e.g. altcos/x86_64/sisyphus/base)",
+        required=True,
+    )
+    parser.add_argument(
+        "--repodir",
+        help="ALTCOS repository directory",
+        required=True,
+    )
+    parser.add_argument(
+        "--commit",
+        help="commit hashsum (default: latest)",
+        default="latest",
+    )
+    parser.add_argument(
+        "--base",
+        help="commit hashsum to compare with (default: parent)",
+        default=None,
+    )
+    parser.add_argument(
+        "--mode",
+        help="OSTree mode",
+        choices=["bare", "archive"],
+        required=True,
+    )
+    parser.add_argument(
+        "-w", "--write",
+        help="write diff to the diff.json next to the commit metadata.json",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-c", "--check",
+        help="check the passed arguments and exit (need for compability with config API)",
+        action="store_true"
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.check:
+        sys.exit(0)
+
+    stream = Stream.from_str(args.repodir, args.stream)
+    repo = Repository(stream, OSTree.RepoMode.BARE if args.mode == "bare" else OSTree.RepoMode.ARCHIVE)
+
+    commit = get_commit(repo, args.commit)
+
+    if args.base:
+        base = get_commit(repo, args.base)
+    elif (parent := commit.parent) is None:
+        logger.error(f"commit \"{commit}\" has no parent")
+        sys.exit(1)
+    else:
+        base = parent
+
+    if not args.write:
+        write_diff(commit, base, sys.stdout)
+        return
+
+    diff_path = stream.vars_dir.joinpath(commit.version.like_path(), "diff.json")
+    with open(diff_path, "w") as file:
+        counts = write_diff(commit, base, file)
+
+    logger.info(f"{diff_path}: {', '.join(f'{kind} {count}' for kind, count in counts.items())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
+# altcosa: entrypoint=main
 
 import argparse
 import dataclasses
-import datetime
 import enum
 import sys
 import typing
@@ -16,6 +16,7 @@ gi.require_version("OSTree", "1.0")
 from gi.repository import GLib, OSTree  # type: ignore # noqa: I202,E402
 
 from altcosa.core.alt import Commit, Repository, Stream, Version  # noqa: E402
+from altcosa.core.history import History  # noqa: E402
 
 
 class VersionPart(enum.StrEnum):
@@ -28,6 +29,7 @@ class VersionView(enum.StrEnum):
     PATH = "path"   # e.g. 20230201/4/1
     NATIVE = "native"  # e.g. 20230201.4.1
     FULL = "full"  # e.g. sisyphus_base.20230201.4.1
+    EXPORT = "export"  # e.g. export VERSION_NATIVE=20230201.4.1;export VERSION_PATH=...
 
 
 @dataclasses.dataclass
@@ -71,12 +73,17 @@ class CliOptions:
                 result = str(version)
             case VersionView.FULL:
                 result = version.full()
+            case VersionView.EXPORT:
+                result = version.export()
 
         print(result)
 
     def _handle(self) -> Version:  # noqa: C901
         stream = Stream.from_str(self.repodir, self.stream)
 
+        if self.commit and (entry := History.for_stream(stream).get(self.commit)) and entry.full_version:
+            return self._inc_part(Version.from_str(entry.full_version))
+
         try:
             repository = Repository(stream, OSTree.RepoMode.BARE)
         except GLib.Error as e:
@@ -123,25 +130,10 @@ class CliOptions:
         :rtype: Version
         """
 
-        if not self.inc_part:
-            return version
-
-        today = datetime.datetime.now().strftime("%Y%m%d")
-        if version.date != today:
-            version.date = today
-            version.major = version.minor = 0
-            return version
-
-        match self.inc_part:
-            case VersionPart.MINOR:
-                version.minor += 1
-            case VersionPart.MAJOR:
-                version.major += 1
-
-        return version
+        return version.increment(self.inc_part)
 
 
-def main() -> None:
+def main(argv: list[str] | None = None) -> None:
     parser = argparse.ArgumentParser()
 
     parser.add_argument("stream",
@@ -159,7 +151,7 @@ def main() -> None:
                         dest="version_view",
                         choices=[*VersionView])
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     CliOptions.from_args(args).handle()
 
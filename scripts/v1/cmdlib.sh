@@ -40,6 +40,53 @@ function get_cmd_api() {
     echo "$api"
 }
 
+__cmdlib_dir=$( cd -- "$( dirname -- "${BASH_SOURCE[0]}" )" &> /dev/null && pwd )
+
+# minimal client of the altcosa.core.query server (runs without site imports)
+QUERY_CLIENT="
+import json
+import socket
+import sys
+
+path, op, *params = sys.argv[1:]
+request = dict(param.split('=', 1) for param in params)
+request['op'] = op
+
+try:
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps(request).encode() + b'\n')
+        response = json.loads(sock.makefile().readline())
+except (OSError, ValueError):
+    sys.exit(2)
+
+if not response['ok']:
+    print(response['error'])
+    sys.exit(1)
+
+print(response['result'], end='')
+"
+
+# query the resident helper (python3 -m altcosa.core.query)
+# the helper is used only if $ALTCOSA_QUERY_SOCKET is set and the socket
+# is owned by the current user (or by the user who called sudo)
+#
+# example:
+#   query_server export stream=altcos/x86_64/p10/base repodir=/srv/altcos
+#
+# returns 2 if the helper is not available
+function query_server() {
+    local socket="${ALTCOSA_QUERY_SOCKET:-}"
+    local owner=
+
+    [ -n "$socket" ] && [ -S "$socket" ] || return 2
+
+    owner="$(stat -c %u "$socket")"
+    [ "$owner" = "$UID" ] || [ "$owner" = "${SUDO_UID:-}" ] || return 2
+
+    python3 -I -S -c "$QUERY_CLIENT" "$socket" "$@"
+}
+
 # export the stream by arch, branch and repodir
 # after success call, variables related to stream allowed in scope
 function export_stream_by_parts() {
@@ -47,8 +94,13 @@ function export_stream_by_parts() {
     local branch=$2
     local repodir=$3
     local name="${4:-base}"
+    local status=0
 
-    cmd="
+    output="$(query_server export_parts \
+        arch="$arch" branch="$branch" repodir="$repodir" name="$name")" || status=$?
+
+    if [ "$status" -eq 2 ]; then
+        cmd="
 import sys
 
 from altcosa.core.alt import *
@@ -60,7 +112,11 @@ except Exception as e:
     sys.exit(1)
 "
 
-    output="$(python3 -c "$cmd" 2>&1)" || {
+        status=0
+        output="$(python3 -c "$cmd" 2>&1)" || status=$?
+    fi
+
+    [ "$status" -eq 0 ] || {
         fatal "$output"
         exit 1
     }
@@ -71,8 +127,12 @@ except Exception as e:
 function export_stream() {
     local stream=$1
     local repodir=$2
+    local status=0
 
-    cmd="
+    output="$(query_server export stream="$stream" repodir="$repodir")" || status=$?
+
+    if [ "$status" -eq 2 ]; then
+        cmd="
 import sys
 
 from altcosa.core.alt import *
@@ -83,7 +143,12 @@ except Exception as e:
     print(e)
     sys.exit(1)
 "
-    output="$(python3 -c "$cmd" 2>&1)" || {
+
+        status=0
+        output="$(python3 -c "$cmd" 2>&1)" || status=$?
+    fi
+
+    [ "$status" -eq 0 ] || {
         fatal "$output"
         exit 1
     }
@@ -96,9 +161,24 @@ function get_commit() {
     local stream=$1
     local repodir=$2
     local mode=$3
+    local status=0
 
     local ostree_mode_n
 
+    output="$(query_server commit stream="$stream" repodir="$repodir" mode="$mode")" || status=$?
+
+    case "$status" in
+        0)
+            echo "$output"
+            return
+            ;;
+        2) ;;
+        *)
+            # if commit not found, just return nothing
+            return
+            ;;
+    esac
+
     case "$mode" in
         bare)
             ostree_mode_n=0 ;;
@@ -130,6 +210,53 @@ except Exception as e:
     echo "$output"
 }
 
+# export all the version views of the stream commit in one call
+# after success call, VERSION_NATIVE (e.g. 20230201.4.1), VERSION_PATH (e.g. 20230201/4/1)
+# and VERSION_FULL (e.g. sisyphus_base.20230201.4.1) allowed in scope
+#
+# arguments: stream repodir [commit (default latest)] [part to increment]
+function export_version() {
+    local stream=$1
+    local repodir=$2
+    local commit="${3:-}"
+    local inc_part="${4:-}"
+    local status=0
+    local args=("$stream" "$repodir")
+
+    output="$(query_server version \
+        stream="$stream" repodir="$repodir" commit="$commit" inc_part="$inc_part")" || status=$?
+
+    if [ "$status" -eq 2 ]; then
+        [ -z "$commit" ] || args+=(--commit "$commit")
+        [ -z "$inc_part" ] || args+=(--inc-part "$inc_part")
+
+        status=0
+        output="$(python3 "$__cmdlib_dir"/cmd-ver.py "${args[@]}" --view export 2>&1)" || status=$?
+    fi
+
+    [ "$status" -eq 0 ] || {
+        fatal "$output"
+        exit 1
+    }
+
+    eval "$output"
+}
+
+# append the new commits of the repository refs to the history index (altcosa.core.history)
+# index is an optimization, so its update failure is not fatal
+#
+# arguments: stream repodir mode
+function update_history() {
+    local stream=$1
+    local repodir=$2
+    local mode=$3
+
+    python3 "$__cmdlib_dir"/cmd-history.py \
+        --stream "$stream" --repodir "$repodir" --mode "$mode" --update 1>&2 || {
+        fatal "failed to update the history index of $stream"
+    }
+}
+
 # Split passwd file (/etc/passwd) into
 # /usr/etc/passwd - home users password file (uid >= 500)
 # /lib/passwd - system users password file (uid < 500)